@@ -0,0 +1,41 @@
+# gunicorn settings, used by the Dockerfile:
+#
+#   gunicorn --config gunicorn.conf.py index:server
+#
+# The app is imported once, in the master process (preload_app), which then loads every page - and with them the release
+# catalog & static figures - before forking the workers, so the workers share that memory copy-on-write rather than each
+# holding its own copy. Simulated results are memory-mapped Arrow files (see upgrade_model/result_store.py), which the
+# workers share through the OS page cache.
+#
+# The master also starts the job queue's server (see job_queue.serve), so every worker submits to & polls the same queue:
+# a job's status polls can be answered by any worker, identical jobs are only run once and their results are shared.
+# Job queues aren't shared between containers, so a deployment with several of them needs session affinity (sticky routing)
+import gc
+import multiprocessing
+import os
+
+bind = f":{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count())) # one per cpu, as pandas & plotly work holds the GIL
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 0 # requests are timed out by Cloud Run; slow simulations run as background jobs (see job_queue.py)
+preload_app = True
+job_queue_server = None # started by when_ready
+
+
+def when_ready(server):
+    # runs in the master process after the app has been imported and before any worker is forked
+    global job_queue_server
+    import index
+    import job_queue
+    import static_figures
+
+    index.load_all_pages()
+    static_figures.load_all()
+    job_queue_server = job_queue.serve()
+    gc.freeze() # so garbage collections in the workers don't write to (and so copy) the pages of everything loaded so far
+
+
+def on_exit(server):
+    if job_queue_server is not None:
+        job_queue_server.terminate()
+        job_queue_server.wait()
@@ -1,20 +1,89 @@
+import importlib
+import threading
+
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
 from dash.dependencies import Input, Output
 import plotly.io as pio
 import plotly.graph_objects as go
+from flask import jsonify
 
 from app import app
 app.set_default_plotly_template()
 server = app.server #underlying Flask server - will be used when running via gunicorn
 
-from pages import home
-from pages import support_escalator
-from pages import upgrade_cycle
-from pages import fleet_metrics
-from pages import population_metrics
-from pages import thanks
+from upgrade_model import result_cache
+
+# Page modules are imported (and their layouts built) the first time they are needed rather than at startup,
+# so the server can accept requests before every page's model computations & figures have been done
+PAGES = {
+    '/pages/support_escalator': 'support_escalator',
+    '/pages/upgrade_cycle': 'upgrade_cycle',
+    '/pages/fleet_metrics': 'fleet_metrics',
+    '/pages/population_metrics': 'population_metrics',
+    '/pages/thanks': 'thanks',
+}
+HOME_PAGE = 'home'
+
+_page_modules = {}
+_page_modules_lock = threading.Lock()
+
+def load_page(name):
+    with _page_modules_lock:
+        if name not in _page_modules:
+            _page_modules[name] = importlib.import_module(f'pages.{name}')
+        return _page_modules[name]
+
+def load_all_pages():
+    for name in [HOME_PAGE] + list(PAGES.values()):
+        load_page(name)
+
+def page_layout(name):
+    layout = load_page(name).layout
+    return layout() if callable(layout) else layout
+
+def register_page_callback(name, function_name, output, inputs):
+    # The page is imported the first time one of its callbacks is dispatched
+    @app.callback(output, inputs)
+    def dispatch(*args):
+        return getattr(load_page(name), function_name)(*args)
+
+# The browser fetches the callback graph (_dash-dependencies) once per visit, so every page's callbacks are declared
+# here - that graph can then be served without importing any of the pages
+PAGE_CALLBACKS = [
+    ('upgrade_cycle', 'update_output',
+     Output('upgrade-cycle-many', 'figure'),
+     [Input('environment_groups', 'value'), Input('environments_per_group', 'value'), Input('upgrade_failure_percentage', 'value'),
+      Input('maintenance_window', 'value'), Input('recalc-button', 'n_clicks')]),
+    ('upgrade_cycle', 'update_target_version_dropdown',
+     Output('target_version', 'options'),
+     [Input('start_version', 'value')]),
+    ('upgrade_cycle', 'update_output_with_support_escalator',
+     Output('support-escalator-job', 'data'),
+     [Input('environment_groups', 'value'), Input('environments_per_group', 'value'), Input('upgrade_failure_percentage', 'value'),
+      Input('maintenance_window', 'value'), Input('start_version', 'value'), Input('target_version', 'value'),
+      Input('recalc-button-with-support-escalator', 'n_clicks')]),
+    ('upgrade_cycle', 'poll_support_escalator_job',
+     [Output('upgrade-cycle-many-with-support-escalator', 'figure'), Output('support-escalator-job-poll', 'disabled'),
+      Output('support-escalator-job-progress', 'value'), Output('support-escalator-job-status', 'children')],
+     [Input('support-escalator-job', 'data'), Input('support-escalator-job-poll', 'n_intervals')]),
+    ('fleet_metrics', 'advance_release_age_slider',
+     Output('release-age-date-slider', 'value'),
+     [Input('advance-release-age-date-slider-interval', 'n_intervals')]),
+    ('fleet_metrics', 'update_release_age_graph',
+     Output('release-age-remain-on-latest-graph', 'figure'),
+     [Input('release-age-date-slider', 'value')]),
+    ('population_metrics', 'update_population_metrics',
+     Output('population-metrics-job', 'data'),
+     [Input('population_cluster_count', 'value'), Input('population_remain_on_latest_percentage', 'value')]),
+    ('population_metrics', 'poll_population_metrics_job',
+     [Output('graph1', 'figure'), Output('population-metrics-job-poll', 'disabled'),
+      Output('population-metrics-job-progress', 'value'), Output('population-metrics-job-status', 'children')],
+     [Input('population-metrics-job', 'data'), Input('population-metrics-job-poll', 'n_intervals')]),
+]
+for page_callback in PAGE_CALLBACKS:
+    register_page_callback(*page_callback)
 
 app.title = "Staying up-to-date with K8s"
 
@@ -48,18 +117,12 @@ Feedback for this [page]({github_page_ref})/[project](https://github.com/users/m
                Output('footer', 'children')],
               [Input('url', 'pathname')])
 def display_page(pathname):
-    if pathname == '/pages/support_escalator':
-        return support_escalator.layout, generate_footer_markdown('https://github.com/mrdavidlaing/staying-up-to-date-explorable/blob/main/pages/support_escalator.py')
-    elif pathname == '/pages/upgrade_cycle':
-        return upgrade_cycle.layout, generate_footer_markdown('https://github.com/mrdavidlaing/staying-up-to-date-explorable/blob/main/pages/upgrade_cycle.py')
-    elif pathname == '/pages/fleet_metrics':
-        return fleet_metrics.layout, generate_footer_markdown('https://github.com/mrdavidlaing/staying-up-to-date-explorable/blob/main/pages/fleet_metrics.py')
-    elif pathname == '/pages/population_metrics':
-        return population_metrics.layout, generate_footer_markdown('https://github.com/mrdavidlaing/staying-up-to-date-explorable/blob/main/pages/population_metrics.py')
-    elif pathname == '/pages/thanks':
-        return thanks.layout, generate_footer_markdown('https://github.com/mrdavidlaing/staying-up-to-date-explorable/blob/main/pages/thanks.py')
-    else:
-        return home.layout, generate_footer_markdown('https://github.com/mrdavidlaing/staying-up-to-date-explorable/blob/main/pages/home.py')
+    name = PAGES.get(pathname, HOME_PAGE)
+    return page_layout(name), generate_footer_markdown(f'https://github.com/mrdavidlaing/staying-up-to-date-explorable/blob/main/pages/{name}.py')
+
+@server.route('/_stats/cache')
+def cache_stats():
+    return jsonify(result_cache.stats())
 
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,326 @@
+# Background jobs for expensive simulations, so a slow figure never holds one of the server's request threads.
+#
+# A callback submits a job (a module level function & its arguments) and gets a job id straight back; the page then polls
+# for the job's status with a dcc.Interval. Each job runs in its own worker process, started by a small broker thread:
+#
+#  * job ids are a hash of the function & its (normalised) arguments, so submitting a job that is already queued, running
+#    or recently finished returns the same id rather than simulating it again
+#  * at most max_workers jobs run at once; the rest wait in submission order
+#  * each job has a time budget, after which its process is terminated and the job reported as timed out
+#  * jobs can call report_progress(fraction, message) to say how far they've got
+#
+# Worker processes are started from a fork server (or spawned) - never forked from the server process itself, whose other
+# threads may be holding locks - and a process forked after the queue was created gets a fresh broker of its own the first
+# time it uses the queue.
+#
+# When several server processes answer requests (eg: gunicorn workers) a job's status polls can land on any of them, so they
+# must share one queue: serve() starts a process holding the queue and sets JOB_QUEUE_ADDRESS, and default_queue() in any
+# process started with JOB_QUEUE_ADDRESS set (eg: gunicorn workers forked after serve()) is a proxy for that queue.
+# Processes that don't share an address (eg: separate containers) don't see each other's jobs, so need sticky routing
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import secrets
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+
+from upgrade_model import result_cache
+
+MAX_WORKERS = int(os.environ.get('JOB_QUEUE_MAX_WORKERS', max(1, (os.cpu_count() or 1) - 1)))
+TIME_BUDGET_SECONDS = float(os.environ.get('JOB_QUEUE_TIME_BUDGET_SECONDS', 60))
+ADDRESS = os.environ.get('JOB_QUEUE_ADDRESS') # of a queue started by serve()
+AUTHKEY = os.environ.get('JOB_QUEUE_AUTHKEY')
+PRELOAD_MODULES = ['pages.upgrade_cycle', 'pages.population_metrics'] # modules holding job functions, imported once by the fork server rather than by every job
+
+QUEUED, RUNNING, DONE, FAILED, TIMED_OUT = 'queued', 'running', 'done', 'failed', 'timed_out'
+FINISHED_STATES = (DONE, FAILED, TIMED_OUT)
+
+_progress_connection = None # set in worker processes
+
+def report_progress(fraction, message=None):
+    # called from within a job; does nothing when the job function is called directly (eg: in tests)
+    if _progress_connection is not None:
+        _progress_connection.send(('progress', (float(fraction), message)))
+
+def _run_job(fn, args, connection):
+    global _progress_connection
+    _progress_connection = connection
+    try:
+        result = fn(*args)
+    except BaseException as e:
+        connection.send((FAILED, f"{type(e).__name__}: {e}"))
+    else:
+        connection.send((DONE, result))
+    finally:
+        connection.close()
+
+def job_id(fn, args):
+    key = [fn.__module__, fn.__qualname__, result_cache.normalize(list(args))]
+    return hashlib.sha256(json.dumps(key, default=str).encode()).hexdigest()[:16]
+
+def start_method():
+    return 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+class Job:
+    __slots__ = ('id', 'fn', 'args', 'time_budget_seconds', 'state', 'progress', 'message', 'result', 'error',
+                 'submitted_at', 'started_at', 'finished_at', 'process', 'connection')
+
+    def __init__(self, id, fn, args, time_budget_seconds):
+        self.id = id
+        self.fn = fn
+        self.args = args
+        self.time_budget_seconds = time_budget_seconds
+        self.state = QUEUED
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.connection = None
+
+    def status(self):
+        elapsed = (self.finished_at or time.monotonic()) - (self.started_at or self.submitted_at)
+        return dict(job_id=self.id, state=self.state, progress=self.progress, message=self.message,
+                    result=self.result, error=self.error, elapsed_seconds=elapsed)
+
+class JobQueue:
+
+    def __init__(self, max_workers=None, time_budget_seconds=None, keep_finished=64, start_method=None):
+        self.max_workers = MAX_WORKERS if max_workers is None else max_workers
+        self.time_budget_seconds = TIME_BUDGET_SECONDS if time_budget_seconds is None else time_budget_seconds
+        self.keep_finished = keep_finished
+        self.start_method = start_method
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._jobs = OrderedDict() # job id -> Job; finished jobs are kept (least recently used first) up to keep_finished
+        self._queued = []
+        self._running = {}
+        self._starting = [] # taken off the queue, with their processes being started outside the lock
+        self._finished_processes = [] # joined outside the lock, see _join_finished_processes
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._broker = None
+
+    def _ensure_broker(self):
+        # called with the lock held
+        if self._broker is None or not self._broker.is_alive():
+            self._broker = threading.Thread(target=self._broker_loop, name='job-queue-broker', daemon=True)
+            self._broker.start()
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            # inherited through a fork: the broker thread & worker processes belong to the parent, so start afresh
+            self._reset()
+
+    def submit(self, fn, *args, time_budget_seconds=None):
+        self._check_process()
+        id = job_id(fn, args)
+        with self._lock:
+            job = self._jobs.get(id)
+            if job is not None and job.state not in (FAILED, TIMED_OUT):
+                self._jobs.move_to_end(id)
+                return id
+            self._jobs[id] = Job(id, fn, args, self.time_budget_seconds if time_budget_seconds is None else time_budget_seconds)
+            self._queued.append(id)
+            self._ensure_broker()
+        self._wakeup.set()
+        return id
+
+    def status(self, id):
+        self._check_process()
+        with self._lock:
+            job = self._jobs.get(id)
+            if job is None:
+                return dict(job_id=id, state='unknown')
+            self._jobs.move_to_end(id)
+            return job.status()
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {state: states.count(state) for state in (QUEUED, RUNNING) + FINISHED_STATES}
+
+    def _start_process(self, job):
+        # called without the lock, as starting a process (or the fork server, the first time) can take a while
+        context = multiprocessing.get_context(self.start_method or start_method())
+        if context.get_start_method() == 'forkserver':
+            context.set_forkserver_preload(PRELOAD_MODULES) # only takes effect when the fork server is first started
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_run_job, args=(job.fn, job.args, sender), daemon=True)
+        process.start()
+        sender.close()
+        return process, receiver
+
+    def _start_queued_jobs(self):
+        with self._lock:
+            free_workers = max(0, self.max_workers - len(self._running))
+            self._starting = starting = [self._jobs[id] for id in self._queued[:free_workers]]
+            del self._queued[:free_workers]
+        started = {}
+        for job in starting:
+            try:
+                started[job.id] = self._start_process(job)
+            except Exception as e:
+                started[job.id] = e
+        with self._lock:
+            for job in starting:
+                if isinstance(started[job.id], Exception):
+                    job.state, job.error, job.finished_at = FAILED, f"Could not start job: {started[job.id]}", time.monotonic()
+                    continue
+                job.process, job.connection = started[job.id]
+                job.state, job.started_at = RUNNING, time.monotonic()
+                self._running[job.id] = job
+                if job not in self._starting: # shut down while its process was being started
+                    self._finish_job(job, FAILED, error="Job queue was shut down")
+            self._starting = []
+        self._join_finished_processes()
+
+    def _finish_job(self, job, state, result=None, error=None):
+        # called with the lock held
+        job.state = state
+        job.result = result
+        job.error = error
+        job.finished_at = time.monotonic()
+        if state == DONE:
+            job.progress = 1.0
+        job.connection.close()
+        if job.process.is_alive():
+            job.process.terminate()
+        self._finished_processes.append(job.process)
+        job.process = job.connection = None
+        del self._running[job.id]
+
+    def _join_finished_processes(self):
+        # without the lock, so a slow exiting process doesn't hold up submit & status calls
+        with self._lock:
+            processes, self._finished_processes = self._finished_processes, []
+        for process in processes:
+            process.join()
+
+    def _evict_finished_jobs(self):
+        finished = [id for id, job in self._jobs.items() if job.state in FINISHED_STATES]
+        for id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[id]
+
+    def _broker_loop(self):
+        while True:
+            self._start_queued_jobs()
+            with self._lock:
+                connections = {job.connection: job for job in self._running.values()}
+                next_deadline = min((job.started_at + job.time_budget_seconds for job in self._running.values()), default=None)
+            if not connections:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            timeout = 0.1 if next_deadline is None else max(0.0, min(0.1, next_deadline - time.monotonic()))
+            ready = multiprocessing.connection.wait(list(connections), timeout=timeout)
+            with self._lock:
+                for connection in ready:
+                    job = connections[connection]
+                    try:
+                        while job.state == RUNNING and connection.poll():
+                            kind, payload = connection.recv()
+                            if kind == 'progress':
+                                job.progress, job.message = payload
+                            elif kind == DONE:
+                                self._finish_job(job, DONE, result=payload)
+                            else:
+                                self._finish_job(job, FAILED, error=payload)
+                    except (EOFError, OSError):
+                        self._finish_job(job, FAILED, error=f"Worker process exited with code {job.process.exitcode}")
+                now = time.monotonic()
+                for job in list(self._running.values()):
+                    if now - job.started_at > job.time_budget_seconds:
+                        self._finish_job(job, TIMED_OUT, error=f"Took longer than its {job.time_budget_seconds:g}s time budget")
+                self._evict_finished_jobs()
+            self._join_finished_processes()
+
+    def shutdown(self):
+        with self._lock:
+            for job in list(self._running.values()):
+                self._finish_job(job, FAILED, error="Job queue was shut down")
+            self._queued.clear()
+            self._starting = []
+        self._join_finished_processes()
+
+class JobQueueManager(BaseManager):
+    pass
+
+_local_queue = None
+_local_queue_lock = threading.Lock()
+
+def local_queue():
+    global _local_queue
+    with _local_queue_lock:
+        if _local_queue is None:
+            _local_queue = JobQueue()
+        return _local_queue
+
+JobQueueManager.register('local_queue', callable=local_queue)
+
+def serve():
+    # starts a process holding a single queue for every process started afterwards (which inherit JOB_QUEUE_ADDRESS &
+    # JOB_QUEUE_AUTHKEY); it is a separate program, so it shares none of the caller's threads, locks or child processes
+    global ADDRESS, AUTHKEY
+    address = os.path.join(tempfile.mkdtemp(prefix='job-queue-'), 'socket')
+    authkey = secrets.token_hex(16)
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), address], env=dict(os.environ, JOB_QUEUE_AUTHKEY=authkey))
+    deadline = time.monotonic() + 60
+    while not os.path.exists(address):
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise RuntimeError(f"Job queue server didn't start (exit code {server.poll()})")
+        time.sleep(0.05)
+    ADDRESS = os.environ['JOB_QUEUE_ADDRESS'] = address
+    AUTHKEY = os.environ['JOB_QUEUE_AUTHKEY'] = authkey
+    return server
+
+def serve_forever(address):
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        JobQueueManager(address=address, authkey=AUTHKEY.encode()).get_server().serve_forever()
+    finally:
+        local_queue().shutdown()
+        shutil.rmtree(os.path.dirname(address), ignore_errors=True)
+
+def connect(address):
+    manager = JobQueueManager(address=address, authkey=AUTHKEY.encode())
+    manager.connect()
+    return getattr(manager, 'local_queue')() # added by JobQueueManager.register
+
+_default_queue = (None, None) # (pid, queue)
+_default_queue_lock = threading.Lock()
+
+def default_queue():
+    global _default_queue
+    with _default_queue_lock:
+        pid, queue = _default_queue
+        if pid != os.getpid():
+            queue = local_queue() if ADDRESS is None else connect(ADDRESS)
+            _default_queue = (os.getpid(), queue)
+        return queue
+
+def submit(fn, *args, time_budget_seconds=None):
+    return default_queue().submit(fn, *args, time_budget_seconds=time_budget_seconds)
+
+def status(id):
+    return default_queue().status(id)
+
+if __name__ == '__main__':
+    import job_queue  # so jobs & their statuses are pickled as job_queue's, not __main__'s
+    job_queue.serve_forever(sys.argv[1])
@@ -0,0 +1,137 @@
+# Load test: starts the app under gunicorn (with gunicorn.conf.py) for each number of workers, sends it a mix of
+# callback requests from concurrent clients & reports requests/sec, latency and each worker's memory use
+#
+#   python load_test.py --workers 1 2 4 --requests 400 --clients 16
+#
+# The mix is fleet metrics' release age graph (a copy of a precomputed static figure, so mostly serialisation) and the
+# upgrade cycle graph with a new seed per request (a simulation each time, as the seeds miss every cache). Memory is read
+# from /proc: shared is memory the worker shares with the master & other workers (eg: preloaded pages), private is its own
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def callback_request(output, inputs):
+    # the body of a POST to /_dash-update-component, as the browser would send it
+    output_id, output_property = output.split('.')
+    return {
+        'output': output,
+        'outputs': {'id': output_id, 'property': output_property},
+        'inputs': [{'id': id, 'property': property, 'value': value} for (id, property), value in inputs],
+        'changedPropIds': [f"{id}.{property}" for (id, property), _ in inputs[-1:]],
+        'state': [],
+    }
+
+
+def request_mix(request_count):
+    for i in range(request_count):
+        if i % 2:
+            yield callback_request('release-age-remain-on-latest-graph.figure', [(('release-age-date-slider', 'value'), i % 24)])
+        else:
+            yield callback_request('upgrade-cycle-many.figure', [
+                (('environment_groups', 'value'), 3),
+                (('environments_per_group', 'value'), 3),
+                (('upgrade_failure_percentage', 'value'), 25),
+                (('maintenance_window', 'value'), 'weekends'),
+                (('recalc-button', 'n_clicks'), i),
+            ])
+
+
+def post(url, body):
+    started = time.perf_counter()
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def start_server(worker_count, port):
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--workers', str(worker_count), '--bind', f"127.0.0.1:{port}", 'index:server'],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=dict(os.environ, JOB_QUEUE_MAX_WORKERS='1'), # the load test doesn't submit background jobs
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_dash-layout").read()
+            return server
+        except OSError:
+            time.sleep(0.25)
+    server.kill()
+    raise RuntimeError(f"gunicorn with {worker_count} workers didn't start within 120s")
+
+
+def worker_pids(server):
+    with open(f"/proc/{server.pid}/task/{server.pid}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def memory_mib(pid):
+    # shared & private resident memory of a process
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        kib = {line.split(':')[0]: int(line.split()[1]) for line in f if line.split()[-1] == 'kB'}
+    return (kib['Shared_Clean'] + kib['Shared_Dirty']) / 1024, (kib['Private_Clean'] + kib['Private_Dirty']) / 1024
+
+
+def run(worker_count, request_count, client_count):
+    port = free_port()
+    server = start_server(worker_count, port)
+    try:
+        url = f"http://127.0.0.1:{port}/_dash-update-component"
+        bodies = list(request_mix(request_count))
+        with ThreadPoolExecutor(client_count) as clients:
+            list(clients.map(lambda body: post(url, body), bodies[:client_count])) # warm up every worker
+            started = time.perf_counter()
+            latencies = list(clients.map(lambda body: post(url, body), bodies))
+            elapsed = time.perf_counter() - started
+        memory = np.array([memory_mib(pid) for pid in worker_pids(server)])
+        return dict(
+            workers=worker_count,
+            requests_per_second=request_count / elapsed,
+            p50_ms=1000 * np.percentile(latencies, 50),
+            p95_ms=1000 * np.percentile(latencies, 95),
+            shared_mib_per_worker=memory[:, 0].mean(),
+            private_mib_per_worker=memory[:, 1].mean(),
+        )
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--clients', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cpus, {args.requests} requests from {args.clients} clients")
+    print(f"{'workers':>7} {'req/s':>8} {'speedup':>7} {'p50 ms':>8} {'p95 ms':>8} {'shared MiB':>10} {'private MiB':>11}  (per worker)")
+    baseline = None
+    for worker_count in args.workers:
+        result = run(worker_count, args.requests, args.clients)
+        baseline = baseline or result['requests_per_second']
+        print(f"{result['workers']:>7} {result['requests_per_second']:>8.1f} {result['requests_per_second'] / baseline:>6.2f}x "
+              f"{result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} {result['shared_mib_per_worker']:>10.0f} {result['private_mib_per_worker']:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,75 @@
 #%%
+import json
 from datetime import datetime
 from datetime import timedelta
-from distutils.version import LooseVersion
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
 import dash
-from dash.dependencies import Input, Output
 from dash.exceptions import PreventUpdate
 
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import numpy as np
 import pandas as pd
 
+from upgrade_model import fleet_state
 from upgrade_model import k8s_releases_loader
+from upgrade_model import population_metrics
 from upgrade_model import upgrade_cycle
 
+import job_queue
 from app import app
 app.set_default_plotly_template()
 
 #%%
+k8s_release_catalog = k8s_releases_loader.load_catalog()
+population_start_date = pd.Timestamp('2017-01-01')
+population_end_date = pd.Timestamp('2021-12-31')
+UPGRADE_EVERY_CHOICES = [30, 90, 180, 365]
+
+def synthetic_fleet(cluster_count, remain_on_latest_percentage, rng=None):
+    # clusters start on any version supported on population_start_date and upgrade every UPGRADE_EVERY_CHOICES days,
+    # apart from remain_on_latest_percentage of them which always run the latest release
+    rng = np.random.default_rng(rng)
+    start_day = k8s_releases_loader.to_days(pd.DatetimeIndex([population_start_date]))[0]
+    supported_versions = k8s_release_catalog.versions[
+        (k8s_release_catalog.release_days <= start_day) & (k8s_release_catalog.end_of_support_days >= start_day)
+    ]
+    remaining_on_latest = rng.random(cluster_count) < remain_on_latest_percentage / 100
+    return pd.DataFrame({
+        'id': [f"cluster-{i}" for i in range(cluster_count)],
+        'first_version': np.where(remaining_on_latest, None, rng.choice(supported_versions, cluster_count)),
+        'upgrade_every': np.where(remaining_on_latest, None, rng.choice(UPGRADE_EVERY_CHOICES, cluster_count)),
+        'policy': np.where(remaining_on_latest, 'remain_on_latest', 'upgrade_every_x_days'),
+    })
+
+def compute_population_metrics(cluster_count, remain_on_latest_percentage, rng=None):
+    environments = fleet_state.validated(synthetic_fleet(cluster_count, remain_on_latest_percentage, rng))
+    days = pd.date_range(population_start_date, population_end_date, freq='D')
+    return population_metrics.from_version_index_windows(
+        days, fleet_state.version_index_windows(environments, days, k8s_release_catalog), k8s_release_catalog
+    )
+
+def population_metrics_figure(metrics):
+    daily = metrics.daily
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.05, subplot_titles=[
+        "Share of clusters on each version (%)", "Clusters on a supported version (%)", "Release age (days): 10th, 50th & 90th percentiles",
+    ])
+    version_share = metrics.version_share.loc[:, (metrics.version_share > 0).any()]
+    for version in version_share.columns:
+        fig.add_trace(go.Scatter(x=version_share.index, y=version_share[version], name=version, stackgroup='version_share',
+                                 mode='lines', line=dict(width=0.5), legendgroup='version'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=daily.at_date, y=daily.supported_percentage, name="supported", mode='lines', showlegend=False), row=2, col=1)
+    fig.add_trace(go.Scatter(x=daily.at_date, y=daily.release_age_p90, mode='lines', line=dict(width=0), showlegend=False), row=3, col=1)
+    fig.add_trace(go.Scatter(x=daily.at_date, y=daily.release_age_p10, mode='lines', line=dict(width=0), fill='tonexty', showlegend=False), row=3, col=1)
+    fig.add_trace(go.Scatter(x=daily.at_date, y=daily.release_age_p50, name="median release age", mode='lines', showlegend=False), row=3, col=1)
+    fig.update_yaxes(range=[0, 100], row=1, col=1)
+    fig.update_yaxes(range=[0, 100], row=2, col=1)
+    fig.update_layout(height=900, legend_title_text='version')
+    return fig
 
 layout = dbc.Container([
     dbc.Row(dbc.Col(html.H1("Population metrics"))),
@@ -30,22 +78,69 @@ layout = dbc.Container([
         Assume you develop a Kubernetes distribution and have 100 organisations as customers.
 
         Let's use the concepts discussed thus far to make some predictions at the population level, including:
-        
+
         * How many clusters should you expect to be running a specific version of Kubernetes in 6 months time?  What about one year?  Two years?
-        * How long after a new release should you expect a majority of cluster to be using it?  
+        * How long after a new release should you expect a majority of cluster to be using it?
         * How many clusters / customers are likely to be running out of support versions in 2 years time?
         ''')
     ])),
     dbc.Card([
-        
+        dbc.CardHeader([
+            dbc.Row([
+                dbc.Col(width=4, children=[
+                    dbc.Label("Clusters"),
+                    dcc.Dropdown(id='population_cluster_count', value=1000, clearable=False, options=[
+                        {'label': f"{count:,}", 'value': count} for count in [100, 1000, 10000]
+                    ]),
+                ]),
+                dbc.Col(width=8, children=[
+                    dbc.Label("% of clusters that always run the latest release"),
+                    dcc.Slider(id='population_remain_on_latest_percentage', min=0, max=100, step=5, value=10,
+                               marks={i: f"{i}%" for i in range(0, 101, 25)}),
+                ]),
+            ]),
+        ]),
         dbc.CardBody([
+            dcc.Store(id='population-metrics-job'),
+            dcc.Interval(id='population-metrics-job-poll', interval=500, disabled=True),
+            dbc.Row([
+                dbc.Col(dbc.Progress(id='population-metrics-job-progress', value=0, striped=True, animated=True), width=4),
+                dbc.Col(html.Small(id='population-metrics-job-status', className="text-muted"), width=8),
+            ]),
             dbc.Row(
-                dbc.Col(dcc.Loading(children=[dcc.Graph(
+                dbc.Col(dcc.Graph(
                     id='graph1',
                     animate=False, #False ensures the axes are redrawn when the graph content changes
-                )]), width=12)
+                ), width=12)
             ),
         ])
     ])
 ])
-# %%
\ No newline at end of file
+
+# This page's callbacks are declared in index.py's PAGE_CALLBACKS
+def update_population_metrics(cluster_count, remain_on_latest_percentage):
+    # computed in a background job, which poll_population_metrics_job checks on until it has finished; identical jobs
+    # (eg: from other server processes sharing the job queue) are only computed once
+    return dict(job_id=job_queue.submit(population_metrics_figure_json, cluster_count, remain_on_latest_percentage))
+
+def poll_population_metrics_job(job, n_intervals):
+    # runs when a job is submitted (which starts the polling) and then on each tick until the job has finished
+    if not job:
+        raise PreventUpdate
+
+    status = job_queue.status(job['job_id'])
+    if status['state'] == 'unknown':
+        # eg: evicted long after it finished, or polled on a server that doesn't share our job queue (see job_queue.py)
+        return dash.no_update, True, 0, "The metrics are no longer available; change a setting to compute them again"
+    if status['state'] == job_queue.DONE:
+        return json.loads(status['result']), True, 100, ""
+    if status['state'] in job_queue.FINISHED_STATES:
+        return dash.no_update, True, 0, f"The metrics couldn't be computed: {status['error']}"
+    return dash.no_update, False, 100 * status['progress'], status['message'] or status['state'].capitalize()
+
+def population_metrics_figure_json(cluster_count, remain_on_latest_percentage):
+    # runs as a job_queue job, in a worker process
+    metrics = compute_population_metrics(cluster_count, remain_on_latest_percentage, rng=0)
+    job_queue.report_progress(0.5, "Drawing the metrics")
+    return population_metrics_figure(metrics).to_json()
+# %%
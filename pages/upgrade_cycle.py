@@ -1,65 +1,136 @@
 # %%
+import json
 from datetime import datetime
 from datetime import timedelta
-from distutils.version import LooseVersion
 
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from dash.dependencies import Input, Output
+import plotly.graph_objects as go
 from dash.exceptions import PreventUpdate
 from plotly.subplots import make_subplots
 
+import job_queue
 from app import app
 from upgrade_model import k8s_releases_loader
+from upgrade_model import maintenance_windows
+from upgrade_model import result_cache
 from upgrade_model import upgrade_cycle
+from upgrade_model import upgrade_path
 
 app.set_default_plotly_template()
 
 k8s_releases = k8s_releases_loader.load()
+k8s_release_catalog = k8s_releases_loader.load_catalog()
+
+# Figures keyed by their (normalised) callback inputs & seed; users tend to flip between the same few settings
+figure_cache = result_cache.LRUCache('upgrade_cycle_figures', maxsize=64)
+
+
+def cached_figure(key, generate_figure):
+    return json.loads(figure_cache.get_or_compute(key, lambda: generate_figure().to_json()))
 
 
 def k8s_versions_sorted():
-    return sorted(k8s_releases.version, key=lambda v: LooseVersion(v))
+    return k8s_release_catalog.versions_in_order()
 
 
 def versions_greater_than(version):
-    return filter(
-        lambda v: LooseVersion(v) > LooseVersion(version),
-        k8s_versions_sorted()
+    return k8s_release_catalog.versions_greater_than(version)
+
+
+def add_maintenance_window_markers(fig, start_date, end_date, maintenance_window='weekends', fillcolor="LightGray"):
+    # all the windows are added in one go; add_shape revalidates every existing shape each time it is called
+    window_starts, window_ends = maintenance_windows.calendar_for(maintenance_window).windows_between(start_date, end_date)
+    fig.layout.shapes += tuple(
+        go.layout.Shape(xref="x", x0=pd.Timestamp(x0), x1=pd.Timestamp(x1),
+                        yref="paper", y0=0, y1=1,
+                        type="rect", fillcolor=fillcolor, opacity=0.5,
+                        layer="below", line_width=0,
+                        )
+        for x0, x1 in zip(window_starts, window_ends)
     )
+    return
 
 
-def k8s_releases_between(start_version, end_version):
-    return filter(
-        lambda v: LooseVersion(v) >= LooseVersion(start_version) and LooseVersion(v) <= LooseVersion(end_version),
-        k8s_versions_sorted()
-    )
+def add_weekend_markers(fig, start_date, end_date, fillcolor="LightGray"):
+    add_maintenance_window_markers(fig, start_date, end_date, 'weekends', fillcolor)
 
 
-def add_weekend_markers(fig, start_date, end_date, fillcolor="LightGray"):
-    for day in pd.date_range(start_date, end_date):
-        if day.weekday() == 5:  # Sat
-            fig.add_shape(xref="x", x0=day, x1=day + timedelta(days=2),  # highlight the whole weekend
-                          yref="paper", y0=0, y1=1,
-                          type="rect", fillcolor=fillcolor, opacity=0.5,
-                          layer="below", line_width=0,
-                          )
-    return
+COMPACT_TIMELINE_MIN_ROWS = 300  # above this many steps, the timeline is drawn in compact mode
+
+
+def uses_compact_timeline(df_steps):
+    return len(df_steps) > COMPACT_TIMELINE_MIN_ROWS
+
 
+def timeline_yaxis(df_steps):
+    phases = df_steps.phase.unique().tolist()
+    if uses_compact_timeline(df_steps):
+        return dict(tickmode='array', tickvals=list(range(len(phases))), ticktext=phases)
+    return dict(categoryorder='array', categoryarray=phases)
 
-def generate_upgrade_steps(environment_groups, upgrade_failure_percentage, maintenance_window):
+
+def compact_timeline_bars(df_steps):
+    # One row per bar to draw: phases become integer positions (labelled by the y axis ticks) and dates epoch milliseconds.
+    # Runs of adjacent phases with an identical step (eg: every cluster in a group waits & upgrades over the same days)
+    # are merged into a single bar spanning all of them, and zero length steps (which wouldn't be visible) are dropped
+    bars = pd.DataFrame({
+        'phase_code': pd.Categorical(df_steps.phase, categories=df_steps.phase.unique()).codes.astype(np.int64),
+        'step': df_steps.step.values,
+        'start': df_steps.start_date.values.astype('datetime64[ms]').astype(np.int64),
+        'duration': (df_steps.finish_date.values - df_steps.start_date.values).astype('timedelta64[ms]').astype(np.int64),
+    })
+    bars = bars[bars.duration > 0].sort_values(['step', 'start', 'duration', 'phase_code'], kind='mergesort')
+    new_bar = (
+        (bars.step != bars.step.shift()) | (bars.start != bars.start.shift()) | (bars.duration != bars.duration.shift())
+        | (bars.phase_code != bars.phase_code.shift() + 1)
+    )
+    bars = bars.groupby(new_bar.cumsum()).agg(
+        step=('step', 'first'), start=('start', 'first'), duration=('duration', 'first'),
+        first_phase_code=('phase_code', 'first'), last_phase_code=('phase_code', 'last'),
+    )
+    bars['y'] = (bars.first_phase_code + bars.last_phase_code) / 2
+    bars['width'] = bars.last_phase_code - bars.first_phase_code + 0.8
+    return bars
+
+
+def timeline_figure(df_steps):
+    if not uses_compact_timeline(df_steps):
+        return px.timeline(df_steps, x_start="start_date", x_end="finish_date", y="phase", color="step")
+
+    # Compact mode: a handful of numeric arrays per step, rather than px.timeline's category label, ISO date strings
+    # and hover text for every row - which makes the payload (and the browser's work) grow quickly with the number of clusters
+    bars = compact_timeline_bars(df_steps)
+    fig = go.Figure([
+        go.Bar(
+            name=step, orientation='h',
+            y=bars.y[bars.step == step].values, width=bars.width[bars.step == step].values,
+            base=bars.start[bars.step == step].values, x=bars.duration[bars.step == step].values,
+            hovertemplate=f"{step}<br>%{{base|%Y-%m-%d}}<extra></extra>",
+        )
+        for step in df_steps.step.unique()  # in order of appearance, so each step gets the same colour as in px.timeline
+    ])
+    fig.update_layout(barmode='overlay', legend_title_text='step')
+    fig.update_xaxes(type='date')
+    fig.update_yaxes(**timeline_yaxis(df_steps))
+    return fig
+
+
+def generate_upgrade_steps(environment_groups, upgrade_failure_percentage, maintenance_window, rng=None):
     df_upgrade_steps = upgrade_cycle.compute_next_upgrade_cycle(
         start_date=datetime.fromisoformat('2020-03-01'),
         environment_groups=environment_groups,
         upgrade_failure_percentage=upgrade_failure_percentage,
-        maintenance_window=maintenance_window
+        maintenance_window=maintenance_window,
+        rng=rng
     )
 
-    fig_upgrade_steps = px.timeline(df_upgrade_steps, x_start="start_date", x_end="finish_date", y="phase", color="step")
+    fig_upgrade_steps = timeline_figure(df_upgrade_steps)
     fig_upgrade_steps.update_yaxes(title=None)
     add_weekend_markers(fig_upgrade_steps, df_upgrade_steps.start_date.min(), df_upgrade_steps.finish_date.max())
     cycle_start = df_upgrade_steps.start_date.min()
@@ -111,7 +182,8 @@ layout = dbc.Container([
                         ])
                     ],
                     upgrade_failure_percentage=0.5,
-                    maintenance_window='weekends'
+                    maintenance_window='weekends',
+                    rng=0
                 ),
                 animate=True,
                 animation_options={'frame': {'redraw': True, }},
@@ -261,11 +333,17 @@ layout = dbc.Container([
             ]),
         ]),
         dbc.CardBody([
+            dcc.Store(id='support-escalator-job'),
+            dcc.Interval(id='support-escalator-job-poll', interval=500, disabled=True),
+            dbc.Row([
+                dbc.Col(dbc.Progress(id='support-escalator-job-progress', value=0, striped=True, animated=True), width=4),
+                dbc.Col(html.Small(id='support-escalator-job-status', className="text-muted"), width=8),
+            ]),
             dbc.Row(
-                dbc.Col(dcc.Loading(children=[dcc.Graph(
+                dbc.Col(dcc.Graph(
                     id='upgrade-cycle-many-with-support-escalator',
                     animate=False,  # False ensures the axes are redrawn when the graph content changes
-                )]), width=12)
+                ), width=12)
             ),
         ])
     ]),
@@ -281,51 +359,38 @@ layout = dbc.Container([
 ])
 
 
-@app.callback(
-    Output(component_id='upgrade-cycle-many', component_property='figure'),
-    [
-        Input(component_id='environment_groups', component_property='value'),
-        Input(component_id='environments_per_group', component_property='value'),
-        Input(component_id='upgrade_failure_percentage', component_property='value'),
-        Input(component_id='maintenance_window', component_property='value'),
-        Input(component_id='recalc-button', component_property='n_clicks'),
-    ]
-)
+# This page's callbacks are declared in index.py's PAGE_CALLBACKS
 def update_output(environment_group_count, environments_per_group, upgrade_failure_percentage, maintenance_window, recalc_counter):
-    return generate_upgrade_steps(
-        environment_groups=[
-            upgrade_cycle.EnvironmentGroup(f'Group {i + 1}', [
-                upgrade_cycle.Environment(f'Cluster {(i) * environments_per_group + (j + 1)}') for j in range(environments_per_group)
-            ]) for i in range(environment_group_count)
-        ],
-        upgrade_failure_percentage=upgrade_failure_percentage / 100,
-        maintenance_window=maintenance_window
+    seed = recalc_counter or 0  # each click of Re-calculate gives a new (but repeatable) outcome
+    return cached_figure(
+        ('upgrade-cycle-many', environment_group_count, environments_per_group, upgrade_failure_percentage, maintenance_window, seed),
+        lambda: generate_upgrade_steps(
+            environment_groups=upgrade_cycle.Fleet.uniform(environment_group_count, environments_per_group),
+            upgrade_failure_percentage=upgrade_failure_percentage / 100,
+            maintenance_window=maintenance_window,
+            rng=seed
+        )
     )
 
 
 # EXPERIMENTAL: This visualisation might be a bit busy
 def generate_upgrade_steps_with_support_elevator(start_date, start_version, target_version, environment_groups, upgrade_failure_percentage,
-                                                 maintenance_window):
-    df_upgrade_steps = pd.DataFrame()
-    next_start_date = start_date
-    upgrade_version_sequence = list(k8s_releases_between(start_version, target_version))
-
-    for current_version, next_version in zip(upgrade_version_sequence, upgrade_version_sequence[1:]):  # loops through version pairs
-        df_next_upgrade_steps = upgrade_cycle.compute_next_upgrade_cycle(
-            start_date=next_start_date,
-            environment_groups=environment_groups,
-            upgrade_failure_percentage=upgrade_failure_percentage,
-            maintenance_window=maintenance_window
-        )
-        df_next_upgrade_steps.phase = f"{current_version} -> {next_version}: " + df_next_upgrade_steps.phase
-        df_upgrade_steps = pd.concat([df_upgrade_steps, df_next_upgrade_steps], sort=False)
-        next_start_date = df_upgrade_steps.finish_date.max()
+                                                 maintenance_window, rng=None):
+    df_upgrade_steps = upgrade_path.plan(
+        start_date=start_date,
+        start_version=start_version,
+        target_version=target_version,
+        environment_groups=environment_groups,
+        upgrade_failure_percentage=upgrade_failure_percentage,
+        maintenance_window=maintenance_window,
+        rng=rng,
+        catalog=k8s_release_catalog
+    ).step_table()
+    job_queue.report_progress(0.5, "Drawing the upgrade steps")
 
     fig = make_subplots(specs=[[{"secondary_y": True}]])
 
-    fig_upgrade_steps = px.timeline(
-        df_upgrade_steps, x_start="start_date", x_end="finish_date", y="phase", color="step"
-    )
+    fig_upgrade_steps = timeline_figure(df_upgrade_steps)
     fig_support_escalator = px.timeline(k8s_releases, x_start="release_date", x_end="end_of_support_date", y="version",
                                         color_discrete_sequence=["LightGray"], opacity=0.5)
 
@@ -339,14 +404,11 @@ def generate_upgrade_steps_with_support_elevator(start_date, start_version, targ
         df_upgrade_steps.finish_date.max() + timedelta(days=7)
     ])
     # Format the (left) upgrade steps axis
-    fig.update_yaxes(
-        secondary_y=True, side='left',
-        categoryorder='array', categoryarray=df_upgrade_steps.phase.unique().tolist()
-    )
+    fig.update_yaxes(secondary_y=True, side='left', **timeline_yaxis(df_upgrade_steps))
     # Format the (right) support escalator axis
     fig.update_yaxes(secondary_y=False, side='right', visible=False, range=[
-        k8s_releases.version[k8s_releases.version == start_version].index[0],
-        k8s_releases.version[k8s_releases.version == target_version].index[0],
+        k8s_release_catalog.position(start_version),
+        k8s_release_catalog.position(target_version),
     ])
 
     cycle_start = df_upgrade_steps.start_date.min()
@@ -360,12 +422,6 @@ def generate_upgrade_steps_with_support_elevator(start_date, start_version, targ
     return fig
 
 
-@app.callback(
-    Output(component_id='target_version', component_property='options'),
-    [
-        Input(component_id='start_version', component_property='value'),
-    ]
-)
 def update_target_version_dropdown(start_version):
     if not start_version:
         raise PreventUpdate
@@ -375,33 +431,43 @@ def update_target_version_dropdown(start_version):
     ]
 
 
-@app.callback(
-    Output(component_id='upgrade-cycle-many-with-support-escalator', component_property='figure'),
-    [
-        Input(component_id='environment_groups', component_property='value'),
-        Input(component_id='environments_per_group', component_property='value'),
-        Input(component_id='upgrade_failure_percentage', component_property='value'),
-        Input(component_id='maintenance_window', component_property='value'),
-        Input(component_id='start_version', component_property='value'),
-        Input(component_id='target_version', component_property='value'),
-        Input(component_id='recalc-button-with-support-escalator', component_property='n_clicks'),
-    ]
-)
 def update_output_with_support_escalator(environment_group_count, environments_per_group, upgrade_failure_percentage, maintenance_window,
                                          start_version, target_version, recalc_counter):
     if 'recalc-button-with-support-escalator' not in [p['prop_id'] for p in dash.callback_context.triggered][0]:
         raise PreventUpdate
 
+    # simulated in a background job, which poll_support_escalator_job checks on until it has finished
+    job_args = [environment_group_count, environments_per_group, upgrade_failure_percentage, maintenance_window,
+                start_version, target_version, recalc_counter or 0]
+    return dict(job_id=job_queue.submit(support_escalator_figure_json, *job_args))
+
+
+def poll_support_escalator_job(job, n_intervals):
+    # runs when a job is submitted (which starts the polling) and then on each tick until the job has finished
+    if not job:
+        raise PreventUpdate
+
+    status = job_queue.status(job['job_id'])
+    if status['state'] == 'unknown':
+        # eg: evicted long after it finished, or polled on a server that doesn't share our job queue (see job_queue.py)
+        return dash.no_update, True, 0, "The simulation is no longer available; press Re-calculate to run it again"
+    if status['state'] == job_queue.DONE:
+        return json.loads(status['result']), True, 100, ""
+    if status['state'] in job_queue.FINISHED_STATES:
+        return dash.no_update, True, 0, f"The simulation didn't finish: {status['error']}"
+    return dash.no_update, False, 100 * status['progress'], status['message'] or status['state'].capitalize()
+
+
+def support_escalator_figure_json(environment_group_count, environments_per_group, upgrade_failure_percentage, maintenance_window,
+                                  start_version, target_version, seed):
+    # runs as a job_queue job, in a worker process
     return generate_upgrade_steps_with_support_elevator(
         start_date=datetime.fromisoformat('2020-03-01'),
         start_version=start_version,
         target_version=target_version,
-        environment_groups=[
-            upgrade_cycle.EnvironmentGroup(f'Group {i + 1}', [
-                upgrade_cycle.Environment(f'Cluster {(i) * environments_per_group + (j + 1)}') for j in range(environments_per_group)
-            ]) for i in range(environment_group_count)
-        ],
+        environment_groups=upgrade_cycle.Fleet.uniform(environment_group_count, environments_per_group),
         upgrade_failure_percentage=upgrade_failure_percentage / 100,
-        maintenance_window=maintenance_window
-    )
+        maintenance_window=maintenance_window,
+        rng=seed
+    ).to_json()
 # %%
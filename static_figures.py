@@ -0,0 +1,95 @@
+# Figures that only depend on k8s-releases.csv are built once (eg: during `docker build`) and saved as JSON artefacts,
+# rather than being computed when each page module is imported.
+#
+#   python static_figures.py   # (re)builds every registered figure
+#
+# Artefact names include a hash of the csv, so an artefact left over from an older csv is never loaded; instead
+# the figure is computed on first use (and saved, if the artefact directory is writable)
+import functools
+import glob
+import hashlib
+import importlib
+import os
+import tempfile
+
+import plotly.io as pio
+
+from upgrade_model import k8s_releases_loader
+
+ARTEFACT_DIR = os.environ.get('STATIC_FIGURES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'precomputed'))
+PAGE_MODULES = ['pages.support_escalator', 'pages.fleet_metrics']
+
+builders = {}
+
+
+@functools.lru_cache(maxsize=None)
+def k8s_releases_hash():
+    with open(k8s_releases_loader.K8S_RELEASE_DATE_CSV, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def artefact_path(name):
+    return os.path.join(ARTEFACT_DIR, f"{name}-{k8s_releases_hash()}.json")
+
+
+def save(name, fig):
+    # written to a temporary file of its own first, as several workers may be saving the same figure at once
+    os.makedirs(ARTEFACT_DIR, exist_ok=True)
+    path = artefact_path(name)
+    fd, tmp_path = tempfile.mkstemp(dir=ARTEFACT_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(fig.to_json())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+@functools.lru_cache(maxsize=None)
+def load(name):
+    try:
+        with open(artefact_path(name)) as f:
+            return pio.from_json(f.read())
+    except FileNotFoundError:
+        fig = builders[name]()
+        try:
+            save(name, fig)
+        except OSError:
+            pass  # eg: a read-only filesystem; we'll just compute it again in the next process
+        return fig
+
+
+def static_figure(name):
+    # Registers a function that builds a figure; calling the decorated function returns the (shared, read-only) figure,
+    # loading it from its artefact the first time it is needed
+    def decorator(build_figure):
+        builders[name] = build_figure
+
+        @functools.wraps(build_figure)
+        def load_figure():
+            return load(name)
+        load_figure.build = build_figure
+        return load_figure
+    return decorator
+
+
+def load_all():
+    # eg: in a server's master process, so the workers it forks share the loaded figures rather than each loading its own
+    for name in builders:
+        load(name)
+
+
+def build():
+    for module in PAGE_MODULES:
+        importlib.import_module(module)  # registers the page's builders
+    for stale_artefact in glob.glob(os.path.join(ARTEFACT_DIR, '*.json')):
+        os.remove(stale_artefact)
+    for name, build_figure in builders.items():
+        save(name, build_figure())
+        print(f"Built {artefact_path(name)}")
+
+
+if __name__ == '__main__':
+    import static_figures  # the pages register their builders with the importable module, not with __main__
+    static_figures.build()
@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+
+import index
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs the requests in a fresh interpreter (so no page has been imported yet) & returns the page modules each one imported
+SERVE_REQUESTS = '''
+import json, sys
+import index
+client = index.server.test_client()
+responses = []
+for method, path, body in json.loads(sys.argv[1]):
+    response = client.open(path, method=method, json=body)
+    responses.append(dict(status=response.status_code, json=response.get_json(),
+                          pages=sorted(name for name in sys.modules if name.startswith('pages.'))))
+print(json.dumps(responses))
+'''
+
+def serve_requests(*requests):
+    output = subprocess.run([sys.executable, '-c', SERVE_REQUESTS, json.dumps(requests)], cwd=ROOT_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+def test_should_serve_the_callback_graph_without_importing_any_page():
+    [dependencies] = serve_requests(('GET', '/_dash-dependencies', None))
+
+    assert dependencies['status'] == 200
+    assert dependencies['pages'] == []
+    outputs = {dependency['output'] for dependency in dependencies['json']}
+    assert 'release-age-remain-on-latest-graph.figure' in outputs
+    assert 'population-metrics-job.data' in outputs
+    assert len(outputs) == len(index.PAGE_CALLBACKS) + 1 # & display_page
+
+def test_should_import_only_the_page_whose_callback_is_dispatched():
+    [_, update] = serve_requests(
+        ('GET', '/_dash-dependencies', None),
+        ('POST', '/_dash-update-component', {
+            'output': 'target_version.options',
+            'outputs': {'id': 'target_version', 'property': 'options'},
+            'inputs': [{'id': 'start_version', 'property': 'value', 'value': '1.17.0'}],
+            'changedPropIds': ['start_version.value'],
+            'state': [],
+        }),
+    )
+
+    assert update['status'] == 200
+    assert update['pages'] == ['pages.upgrade_cycle']
+    assert {'label': '1.18.0', 'value': '1.18.0'} in update['json']['response']['target_version']['options']
+
+def test_should_declare_callbacks_that_every_page_defines():
+    for name, function_name, _, _ in index.PAGE_CALLBACKS:
+        assert callable(getattr(index.load_page(name), function_name))
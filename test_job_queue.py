@@ -0,0 +1,105 @@
+import threading
+import time
+
+import job_queue
+
+def double(value):
+    job_queue.report_progress(0.5, "Halfway")
+    return value * 2
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+def fail(message):
+    raise ValueError(message)
+
+def wait_until_finished(queue, id, timeout_seconds=30):
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        status = queue.status(id)
+        if status['state'] in job_queue.FINISHED_STATES:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {id} didn't finish within {timeout_seconds}s")
+
+def test_should_run_jobs_in_worker_processes():
+    queue = job_queue.JobQueue(max_workers=1, start_method='spawn')
+    try:
+        status = wait_until_finished(queue, queue.submit(double, 21))
+
+        assert status['state'] == job_queue.DONE
+        assert status['result'] == 42
+        assert status['progress'] == 1.0
+        assert queue.status('no-such-job')['state'] == 'unknown'
+    finally:
+        queue.shutdown()
+
+def test_should_deduplicate_identical_jobs():
+    queue = job_queue.JobQueue(max_workers=1, start_method='spawn')
+    try:
+        id = queue.submit(sleep, 0.5)
+
+        assert queue.submit(sleep, 0.5) == id
+        assert queue.submit(sleep, 0.25) != id
+        wait_until_finished(queue, id)
+        assert queue.submit(sleep, 0.5) == id # finished jobs are kept too
+        assert queue.stats()[job_queue.DONE] + queue.stats()[job_queue.RUNNING] + queue.stats()[job_queue.QUEUED] == 2
+    finally:
+        queue.shutdown()
+
+def test_should_report_failed_and_timed_out_jobs():
+    queue = job_queue.JobQueue(max_workers=2, time_budget_seconds=1, start_method='spawn')
+    try:
+        failed = wait_until_finished(queue, queue.submit(fail, "no releases"))
+        timed_out = wait_until_finished(queue, queue.submit(sleep, 30))
+
+        assert failed['state'] == job_queue.FAILED
+        assert failed['error'] == "ValueError: no releases"
+        assert timed_out['state'] == job_queue.TIMED_OUT
+        assert timed_out['elapsed_seconds'] < 10
+    finally:
+        queue.shutdown()
+
+def test_should_start_processes_without_holding_up_other_calls():
+    queue = job_queue.JobQueue(max_workers=2, start_method='spawn')
+    start_process, starting, release = queue._start_process, threading.Event(), threading.Event()
+    def slow_start_process(job):
+        starting.set()
+        release.wait(10)
+        if job.args == ("no process",):
+            raise OSError("no process")
+        return start_process(job)
+    queue._start_process = slow_start_process
+    try:
+        id, unstartable = queue.submit(double, 21), queue.submit(fail, "no process")
+        assert starting.wait(10)
+
+        started = time.monotonic()
+        assert queue.status(id)['state'] == job_queue.QUEUED
+        assert time.monotonic() - started < 1
+        release.set()
+        assert wait_until_finished(queue, id)['result'] == 42
+        assert wait_until_finished(queue, unstartable)['error'] == "Could not start job: no process"
+    finally:
+        release.set()
+        queue.shutdown()
+
+def test_should_share_one_queue_between_processes(monkeypatch):
+    monkeypatch.setenv('JOB_QUEUE_ADDRESS', '')
+    monkeypatch.setenv('JOB_QUEUE_AUTHKEY', '')
+    monkeypatch.setattr(job_queue, 'ADDRESS', None)
+    monkeypatch.setattr(job_queue, 'AUTHKEY', None)
+    monkeypatch.setattr(job_queue, '_default_queue', (None, None))
+    server = job_queue.serve()
+    try:
+        queue, other_queue = job_queue.connect(job_queue.ADDRESS), job_queue.connect(job_queue.ADDRESS)
+        id = queue.submit(double, 4)
+
+        assert other_queue.submit(double, 4) == id
+        assert wait_until_finished(other_queue, id)['result'] == 8
+        assert job_queue.submit(double, 4) == id # via the default queue, which now uses the server
+        assert job_queue.status(id)['result'] == 8
+    finally:
+        server.terminate()
+        server.wait()
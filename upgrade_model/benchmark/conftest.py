@@ -0,0 +1,90 @@
+# Benchmarks are skipped unless asked for, since timings only mean something compared to a baseline from the same machine:
+#
+#   pytest upgrade_model/benchmark --benchmark                          # fails if any scenario is >50% slower than its baseline
+#   pytest upgrade_model/benchmark --benchmark --benchmark-threshold=0.2
+#   pytest upgrade_model/benchmark --benchmark --benchmark-update-baseline
+#
+# Each run is appended to the history file; scenarios without a baseline take this run's timing as their baseline.
+# Timings are recorded relative to a fixed calibration workload timed alongside each scenario, so a machine that is
+# busier (or slower) than when the baseline was taken doesn't show up as a regression
+import gc
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(__file__), 'benchmark_history.json')
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark')
+    group.addoption('--benchmark', action='store_true', default=False, help='run the upgrade_model benchmarks')
+    group.addoption('--benchmark-threshold', type=float, default=0.5, help='fail when a scenario is this fraction slower than its baseline')
+    group.addoption('--benchmark-history', default=DEFAULT_HISTORY, help='json file holding the baseline and previous runs')
+    group.addoption('--benchmark-update-baseline', action='store_true', default=False, help="make this run's timings the baseline")
+
+def load_history(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return dict(baseline={}, runs=[])
+
+def calibration_workload(values=np.random.default_rng(0).random(200_000)):
+    np.sort(values)
+    sum(range(20_000))
+
+def fastest_duration(fn, min_repeat=5, min_seconds=0.5):
+    # the fastest of several runs is the least noisy estimate of what the code itself costs
+    fn() # warm up
+    durations = []
+    gc.disable() # like timeit, so a collection triggered by earlier scenarios isn't charged to this one
+    try:
+        while len(durations) < min_repeat or sum(durations) < min_seconds:
+            started = time.perf_counter()
+            fn()
+            durations.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return min(durations)
+
+class Benchmarks:
+    def __init__(self, config):
+        self.threshold = config.getoption('--benchmark-threshold')
+        self.history_path = config.getoption('--benchmark-history')
+        self.update_baseline = config.getoption('--benchmark-update-baseline')
+        self.history = load_history(self.history_path)
+        self.results = {}
+
+    def __call__(self, scenario, fn):
+        duration = fastest_duration(fn)
+        relative_duration = duration / fastest_duration(calibration_workload)
+        self.results[scenario] = dict(seconds=duration, relative=relative_duration)
+
+        baseline = self.history['baseline'].get(scenario)
+        if baseline and not self.update_baseline and relative_duration > baseline['relative'] * (1 + self.threshold):
+            pytest.fail(
+                f"{scenario} regressed: {relative_duration:.2f}x vs a baseline of {baseline['relative']:.2f}x the calibration workload "
+                f"({duration*1000:.1f}ms vs {baseline['seconds']*1000:.1f}ms, threshold {self.threshold:.0%})"
+            )
+        return duration
+
+    def save(self):
+        if not self.results:
+            return
+        for scenario, result in self.results.items():
+            if self.update_baseline or scenario not in self.history['baseline']:
+                self.history['baseline'][scenario] = result
+        self.history['runs'].append(dict(at=datetime.now().isoformat(timespec='seconds'), results=self.results))
+        with open(self.history_path, 'w') as f:
+            json.dump(self.history, f, indent=2, sort_keys=True)
+
+@pytest.fixture(scope='session')
+def benchmarks(request):
+    if not request.config.getoption('--benchmark', default=False):
+        pytest.skip('benchmarks only run with --benchmark')
+    benchmarks = Benchmarks(request.config)
+    yield benchmarks
+    benchmarks.save()
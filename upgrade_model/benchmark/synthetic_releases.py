@@ -0,0 +1,14 @@
+import numpy as np
+import pandas as pd
+
+from upgrade_model import k8s_releases_loader
+
+def synthetic_catalog(release_count, first_release_date='1950-01-01', release_every_days=30, supported_for_days=270):
+    # A release catalog far larger than k8s-releases.csv, with the same shape: 1.N.0 versions released at a
+    # steady cadence, each supported for a fixed period
+    release_dates = pd.Timestamp(first_release_date) + pd.to_timedelta(np.arange(release_count) * release_every_days, unit='D')
+    return k8s_releases_loader.ReleaseCatalog.from_frame(pd.DataFrame(dict(
+        version=[f'1.{i}.0' for i in range(release_count)],
+        release_date=release_dates,
+        end_of_support_date=release_dates + pd.Timedelta(days=supported_for_days),
+    )))
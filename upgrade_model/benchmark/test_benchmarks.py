@@ -0,0 +1,140 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from upgrade_model import fleet_state
+from upgrade_model import k8s_releases_loader
+from upgrade_model import population_metrics
+from upgrade_model import remain_on_latest
+from upgrade_model import result_store
+from upgrade_model import scheduler
+from upgrade_model import upgrade_cycle
+from upgrade_model import upgrade_every_x_days
+from upgrade_model import upgrade_path
+from upgrade_model.benchmark.synthetic_releases import synthetic_catalog
+
+def catalog_for(release_count):
+    if release_count is None:
+        return k8s_releases_loader.load_catalog() # the real 17 releases in k8s-releases.csv
+    return synthetic_catalog(release_count)
+
+def horizon_for(catalog, days):
+    start_date = pd.Timestamp(catalog.release_dates.min())
+    return start_date, start_date + pd.Timedelta(days=days-1)
+
+@pytest.mark.parametrize('release_count', [None, 200, 2000])
+@pytest.mark.parametrize('days', [365, 3650])
+def test_upgrade_every_x_days(benchmarks, days, release_count):
+    catalog = catalog_for(release_count)
+    start_date, end_date = horizon_for(catalog, days)
+
+    benchmarks(f'upgrade_every_x_days.compute[days={days},releases={len(catalog)}]', lambda: upgrade_every_x_days.compute(
+        id='benchmark', start_date=start_date, end_date=end_date, first_version=catalog.versions[0], upgrade_every=30, catalog=catalog
+    ))
+
+@pytest.mark.parametrize('release_count', [None, 200, 2000])
+@pytest.mark.parametrize('days', [365, 3650])
+def test_remain_on_latest(benchmarks, days, release_count):
+    catalog = catalog_for(release_count)
+    start_date, end_date = horizon_for(catalog, days)
+
+    benchmarks(f'remain_on_latest.compute[days={days},releases={len(catalog)}]', lambda: remain_on_latest.compute(
+        id='benchmark', start_date=start_date, end_date=end_date, catalog=catalog
+    ))
+
+@pytest.mark.parametrize('release_count', [None, 200])
+@pytest.mark.parametrize('environment_count', [100, 1000, 5000])
+def test_fleet_state(benchmarks, environment_count, release_count):
+    catalog = catalog_for(release_count)
+    start_date, end_date = horizon_for(catalog, 3*365)
+    rng = np.random.default_rng(0)
+    environments = pd.DataFrame(dict(
+        id=[f'cluster-{i}' for i in range(environment_count)],
+        first_version=rng.choice(catalog.versions[:4], environment_count),
+        upgrade_every=rng.integers(1, 365, environment_count),
+        policy=rng.choice(fleet_state.POLICIES, environment_count),
+    ))
+
+    benchmarks(f'fleet_state.compute[environments={environment_count},days={3*365},releases={len(catalog)}]', lambda: fleet_state.compute(
+        environments, start_date=start_date, end_date=end_date, catalog=catalog
+    ))
+
+@pytest.mark.parametrize('environment_count', [1000, 10000])
+def test_population_metrics(benchmarks, environment_count):
+    catalog = catalog_for(None)
+    days = pd.date_range('2017-01-01', periods=5*365, freq='D')
+    rng = np.random.default_rng(0)
+    environments = fleet_state.validated(pd.DataFrame(dict(
+        id=[f'cluster-{i}' for i in range(environment_count)],
+        first_version=rng.choice(catalog.versions[:6], environment_count),
+        upgrade_every=rng.integers(1, 365, environment_count),
+        policy='upgrade_every_x_days',
+    )))
+    k8s_version_idxs = fleet_state.version_index_windows(environments, days, catalog)(0, len(days))
+
+    benchmarks(f'population_metrics.from_version_indexes[environments={environment_count},days={len(days)}]', lambda: population_metrics.from_version_indexes(
+        days, k8s_version_idxs, catalog
+    ))
+
+@pytest.mark.parametrize('group_count', [1, 10, 100])
+@pytest.mark.parametrize('environment_count', [1000, 10000])
+def test_compute_next_upgrade_cycle(benchmarks, environment_count, group_count):
+    environment_groups = [
+        upgrade_cycle.EnvironmentGroup(f'Group {g+1}', [
+            upgrade_cycle.Environment(f'Cluster {i+1}') for i in range(environment_count // group_count)
+        ]) for g in range(group_count)
+    ]
+
+    benchmarks(f'upgrade_cycle.compute_next_upgrade_cycle[environments={environment_count},groups={group_count}]', lambda: upgrade_cycle.compute_next_upgrade_cycle(
+        start_date=datetime.fromisoformat('2020-01-01'), environment_groups=environment_groups, upgrade_failure_percentage=0.25, rng=0
+    ))
+
+def test_compute_next_upgrade_cycle_scales_linearly(benchmarks):
+    durations = {}
+    for environment_count in [10_000, 100_000]:
+        fleet = upgrade_cycle.Fleet.uniform(10, environment_count // 10)
+        durations[environment_count] = benchmarks(f'upgrade_cycle.compute_next_upgrade_cycle.scaling[environments={environment_count},groups=10]', lambda: upgrade_cycle.compute_next_upgrade_cycle(
+            start_date=datetime.fromisoformat('2020-01-01'), environment_groups=fleet, upgrade_failure_percentage=0.25, rng=0
+        ))
+
+    # 10x the environments should cost roughly 10x the time; quadratic growth would be ~100x
+    assert durations[100_000] < 25 * durations[10_000]
+
+@pytest.mark.parametrize('max_concurrent_upgrades', [None, 10])
+@pytest.mark.parametrize('hop_count', [1, 10])
+def test_schedule_upgrade_cycles(benchmarks, hop_count, max_concurrent_upgrades):
+    environment_groups = [
+        upgrade_cycle.EnvironmentGroup(f'Group {g+1}', [
+            upgrade_cycle.Environment(f'Cluster {i+1}') for i in range(100)
+        ]) for g in range(100)
+    ]
+    hops = [f'hop {h+1}' for h in range(hop_count)]
+
+    benchmarks(f'scheduler.schedule_upgrade_cycles[environments=10000,hops={hop_count},slots={max_concurrent_upgrades}]', lambda: scheduler.schedule_upgrade_cycles(
+        start_date=datetime.fromisoformat('2020-01-01'), environment_groups=environment_groups, hops=hops,
+        upgrade_failure_percentage=0.25, max_concurrent_upgrades=max_concurrent_upgrades, rng=0
+    ))
+
+@pytest.mark.parametrize('environment_count', [100, 1000])
+def test_upgrade_path(benchmarks, environment_count):
+    catalog = synthetic_catalog(40, first_release_date='2015-01-01')
+    environment_groups = upgrade_cycle.Fleet.uniform(10, environment_count // 10)
+
+    benchmarks(f'upgrade_path.plan[environments={environment_count},hops=20]', lambda: upgrade_path.plan(
+        start_date=datetime.fromisoformat('2020-03-01'), start_version='1.10.0', target_version='1.30.0',
+        environment_groups=environment_groups, upgrade_failure_percentage=0.05, rng=0, catalog=catalog
+    ).step_table())
+
+@pytest.mark.parametrize('environment_count', [100, 1000])
+def test_result_store_load(benchmarks, environment_count, tmp_path):
+    environments = pd.DataFrame(dict(
+        id=[f'cluster-{i}' for i in range(environment_count)],
+        policy='remain_on_latest',
+    ))
+    result_store.save('benchmark', 'environment_state', fleet_state.compute(environments, start_date='2018-01-01', end_date='2027-12-31'), store_dir=tmp_path)
+
+    benchmarks(f'result_store.load[environments={environment_count},days=3652]', lambda: result_store.load(
+        'benchmark', 'environment_state', store_dir=tmp_path
+    ))
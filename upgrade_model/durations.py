@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# A duration model is anything with these two methods, each evaluated over arrays of environments at once:
+#   upgrade_days(nodes, pods) -> int64 days to upgrade each environment
+#   recover_days(upgrade_days, failed) -> int64 days to recover each environment from a failed upgrade (0 if it didn't fail)
+
+@dataclass(frozen=True)
+class FixedDurations:
+    upgrade_day_count:  int = 1 # every environment takes the same time, whatever its size
+    recovery_day_count: int = 1
+
+    def upgrade_days(self, nodes, pods):
+        return np.full(np.shape(nodes), self.upgrade_day_count, dtype=np.int64)
+
+    def recover_days(self, upgrade_days, failed):
+        # Assume recover takes recovery_day_count days + having to rerun original upgrade
+        return np.where(failed, self.recovery_day_count + np.asarray(upgrade_days, dtype=np.int64), 0)
+
+@dataclass(frozen=True)
+class RollingUpgradeDurations:
+    nodes_per_batch:    int = 1      # nodes cordoned, drained & replaced at the same time (ie: max surge)
+    hours_per_batch:    float = 0.25 # to drain a batch of nodes and bring up their replacements
+    hours_per_pod:      float = 0.01 # to reschedule a pod and wait for it to become ready
+    hours_per_day:      float = 8    # working hours available for upgrades each day
+    recovery_day_count: int = 1
+
+    def upgrade_hours(self, nodes, pods):
+        batches = np.ceil(np.asarray(nodes, dtype=np.float64) / self.nodes_per_batch)
+        return batches * self.hours_per_batch + np.asarray(pods, dtype=np.float64) * self.hours_per_pod
+
+    def upgrade_days(self, nodes, pods):
+        return np.maximum(1, np.ceil(self.upgrade_hours(nodes, pods) / self.hours_per_day)).astype(np.int64)
+
+    def recover_days(self, upgrade_days, failed):
+        return np.where(failed, self.recovery_day_count + np.asarray(upgrade_days, dtype=np.int64), 0)
+
+DEFAULT_DURATION_MODEL = RollingUpgradeDurations() # 1 day for the default 3 node, 30 pod environment
+
+def duration_model_or_default(duration_model):
+    return DEFAULT_DURATION_MODEL if duration_model is None else duration_model
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from upgrade_model import k8s_releases_loader
+
+# environment_id & version are categoricals (versions listed in semantic version order), dates are datetime64[ns]
+# and release_age & days_until_end_of_support are int32 days, so a row costs ~30 bytes however long the names are
+DAYS_DTYPE = np.int32
+
+def version_dtype(k8s_release_catalog):
+    return pd.CategoricalDtype(k8s_release_catalog.versions_in_order())
+
+def versions_from_codes(version_codes, k8s_release_catalog):
+    return pd.Categorical.from_codes(version_codes, dtype=version_dtype(k8s_release_catalog))
+
+def environment_categorical(environment_ids):
+    # keeps the categories of an existing categorical (eg: a chunk of a larger fleet), otherwise they are in order of appearance
+    if isinstance(getattr(environment_ids, 'dtype', None), pd.CategoricalDtype):
+        return pd.Categorical(environment_ids)
+    codes, categories = pd.factorize(np.asarray(environment_ids))
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def state_columns(days, k8s_version_idxs, k8s_release_catalog):
+    # the per-version columns of the state, each shaped like k8s_version_idxs (environments x days);
+    # version holds codes of version_dtype(k8s_release_catalog), see versions_from_codes
+    k8s_version_idxs = np.asarray(k8s_version_idxs)
+    at_days = k8s_releases_loader.to_days(days).astype(DAYS_DTYPE)
+    return {
+        'version': k8s_release_catalog.version_ranks.astype(np.int16)[k8s_version_idxs],
+        'release_date': k8s_release_catalog.release_dates[k8s_version_idxs],
+        'end_of_support_date': k8s_release_catalog.end_of_support_dates[k8s_version_idxs],
+        'release_age': at_days - k8s_release_catalog.release_days.astype(DAYS_DTYPE)[k8s_version_idxs],
+        'days_until_end_of_support': k8s_release_catalog.end_of_support_days.astype(DAYS_DTYPE)[k8s_version_idxs] - at_days,
+    }
+
+def state_frame(leading_columns, columns, k8s_release_catalog):
+    # columns are flattened state_columns, after leading_columns (eg: environment_id & at_date)
+    columns = {column: values.reshape(-1) for column, values in columns.items()}
+    columns['version'] = versions_from_codes(columns['version'], k8s_release_catalog)
+    return pd.DataFrame({**leading_columns, **columns}, copy=False)
+
+def from_version_indexes(environment_ids, days, k8s_version_idxs, k8s_release_catalog):
+    # k8s_version_idxs is an (environments x days) array of positions in k8s_release_catalog
+    environment_ids = environment_categorical(environment_ids)
+    days = pd.DatetimeIndex(days)
+    return state_frame({
+        'environment_id': pd.Categorical.from_codes(np.repeat(environment_ids.codes, len(days)), dtype=environment_ids.dtype),
+        'at_date': np.tile(days.values, len(environment_ids)),
+    }, state_columns(days, np.reshape(k8s_version_idxs, (len(environment_ids), len(days))), k8s_release_catalog), k8s_release_catalog)
+
+def with_state_dtypes(environment_state, k8s_release_catalog=None):
+    # environment state from elsewhere (eg: a csv) with the dtypes the models emit
+    k8s_release_catalog = k8s_releases_loader.load_catalog() if k8s_release_catalog is None else k8s_release_catalog
+    dtypes = {'version': version_dtype(k8s_release_catalog), 'release_age': DAYS_DTYPE, 'days_until_end_of_support': DAYS_DTYPE}
+    environment_state = environment_state.astype({column: dtype for column, dtype in dtypes.items() if column in environment_state.columns})
+    if 'environment_id' in environment_state.columns:
+        environment_state['environment_id'] = environment_categorical(environment_state['environment_id'])
+    return environment_state
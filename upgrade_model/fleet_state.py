@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from upgrade_model import environment_state as environment_state_builder
+from upgrade_model import k8s_releases_loader
+from upgrade_model import remain_on_latest
+from upgrade_model import upgrade_every_x_days
+
+k8s_release_catalog = k8s_releases_loader.load_catalog()
+
+POLICIES = ['upgrade_every_x_days', 'remain_on_latest']
+CHUNK_ROWS = 1_000_000 # default upper bound on the rows in each chunk of compute_chunks
+
+def validated(environments):
+    environments = pd.DataFrame(environments).reset_index(drop=True)
+    unknown_policies = set(environments['policy']) - set(POLICIES)
+    if unknown_policies:
+        raise ValueError(f"Unknown policies {sorted(unknown_policies)}, expected one of {POLICIES}")
+    return environments
+
+def version_index_windows(environments, days, catalog):
+    # Returns window(start_offset, stop_offset) -> (environments x days) positions in the catalog for just those days.
+    # The upgrade events & latest releases are worked out once, so materialising a long horizon a window at a time stays cheap
+    upgrading = (environments['policy'] == 'upgrade_every_x_days').values
+    remaining_on_latest = (environments['policy'] == 'remain_on_latest').values
+    if upgrading.any():
+        first_version_idxs = catalog.positions_of(environments.loc[upgrading, 'first_version'])
+        event_offsets = upgrade_every_x_days.upgrade_event_offsets(
+            days, first_version_idxs, environments.loc[upgrading, 'upgrade_every'].astype(np.int64).values, catalog
+        )
+    if remaining_on_latest.any():
+        latest_version_idxs = remain_on_latest.latest_version_indexes(days, catalog)
+
+    def window(start_offset, stop_offset):
+        k8s_version_idxs = np.empty((len(environments), stop_offset-start_offset), dtype=np.int64)
+        if upgrading.any():
+            k8s_version_idxs[upgrading] = upgrade_every_x_days.version_indexes_from_events(
+                event_offsets, first_version_idxs, start_offset, stop_offset, catalog
+            )
+        if remaining_on_latest.any():
+            k8s_version_idxs[remaining_on_latest] = latest_version_idxs[start_offset:stop_offset]
+        return k8s_version_idxs
+
+    return window
+
+def compute(environments, start_date, end_date, catalog=None):
+    # environments is a table with one row per environment:
+    #   id, policy and - for the upgrade_every_x_days policy - first_version and upgrade_every
+    catalog = k8s_release_catalog if catalog is None else catalog
+    environments = validated(environments)
+    days = pd.date_range(start=start_date, end=end_date, freq='D')
+
+    k8s_version_idxs = version_index_windows(environments, days, catalog)(0, len(days))
+
+    return environment_state_builder.from_version_indexes(environments['id'], days, k8s_version_idxs, catalog)
+
+def environment_chunks(environments, days, chunk_rows):
+    environments_per_chunk = max(1, chunk_rows // max(1, len(days)))
+    for first in range(0, len(environments), environments_per_chunk):
+        yield environments.iloc[first:first+environments_per_chunk]
+
+def compute_chunks(environments, start_date, end_date, chunk_rows=CHUNK_ROWS, by='environment', catalog=None):
+    # The same rows as compute, yielded as a sequence of frames of at most chunk_rows rows (or one environment / day if that is more),
+    # so long horizons over large fleets never need to be held in memory at once. Chunks hold either a block of whole
+    # environments (by='environment') or every environment over a block of days (by='date')
+    catalog = k8s_release_catalog if catalog is None else catalog
+    environments = validated(environments)
+    days = pd.date_range(start=start_date, end=end_date, freq='D')
+
+    environment_ids = environment_state_builder.environment_categorical(environments['id']) # every chunk shares the categories
+    if by == 'environment':
+        for chunk in environment_chunks(environments, days, chunk_rows):
+            k8s_version_idxs = version_index_windows(chunk, days, catalog)(0, len(days))
+            yield environment_state_builder.from_version_indexes(environment_ids[chunk.index.values], days, k8s_version_idxs, catalog)
+    elif by == 'date':
+        window = version_index_windows(environments, days, catalog)
+        days_per_chunk = max(1, chunk_rows // max(1, len(environments)))
+        for start_offset in range(0, len(days), days_per_chunk):
+            stop_offset = min(start_offset+days_per_chunk, len(days))
+            yield environment_state_builder.from_version_indexes(
+                environment_ids, days[start_offset:stop_offset], window(start_offset, stop_offset), catalog
+            )
+    else:
+        raise ValueError(f"Unknown chunking {by}, expected 'environment' or 'date'")
+
+def compute_intervals(environments, start_date, end_date, chunk_rows=CHUNK_ROWS, catalog=None):
+    # Run length encoded version of compute: one row per environment per version it runs, valid from & to (inclusive) the given dates
+    catalog = k8s_release_catalog if catalog is None else catalog
+    environments = validated(environments)
+    days = pd.date_range(start=start_date, end=end_date, freq='D')
+
+    environment_ids = environment_state_builder.environment_categorical(environments['id'])
+    intervals = []
+    for chunk in environment_chunks(environments if len(days) else environments.iloc[:0], days, chunk_rows): # an empty horizon has no intervals
+        k8s_version_idxs = version_index_windows(chunk, days, catalog)(0, len(days))
+        changes = np.ones(k8s_version_idxs.shape, dtype=bool)
+        changes[:, 1:] = k8s_version_idxs[:, 1:] != k8s_version_idxs[:, :-1]
+        rows, valid_from_offsets = np.nonzero(changes)
+        valid_to_offsets = np.append(valid_from_offsets[1:] - 1, len(days) - 1)
+        last_in_row = np.append(rows[1:] != rows[:-1], True)
+        valid_to_offsets[last_in_row] = len(days) - 1
+
+        intervals.append(pd.DataFrame({
+            'environment_id': environment_ids[chunk.index.values[rows]],
+            'version': environment_state_builder.versions_from_codes(catalog.version_ranks[k8s_version_idxs[rows, valid_from_offsets]], catalog),
+            'valid_from': days.values[valid_from_offsets],
+            'valid_to': days.values[valid_to_offsets],
+        }))
+
+    if not intervals:
+        return pd.DataFrame({
+            'environment_id': environment_ids[:0],
+            'version': environment_state_builder.versions_from_codes(np.empty(0, dtype=np.int64), catalog),
+            'valid_from': np.empty(0, dtype='datetime64[ns]'),
+            'valid_to': np.empty(0, dtype='datetime64[ns]'),
+        })
+    return pd.concat(intervals, ignore_index=True)
@@ -0,0 +1,97 @@
+# Incremental recompute of fleet state after the release catalog changes (eg: a new release is appended to k8s-releases.csv).
+#
+# The models only ever look forward in time, so every day before the first release affected by the change is unchanged.
+# recompute keeps that prefix of each environment's state and re-simulates just the days after it, resuming each
+# environment from the version it was on & the day it last upgraded. It relies on the state being laid out the way
+# fleet_state.compute does it: environment by environment, with a row for every day
+import numpy as np
+import pandas as pd
+
+from upgrade_model import environment_state as environment_state_builder
+from upgrade_model import fleet_state
+from upgrade_model import remain_on_latest
+from upgrade_model import upgrade_every_x_days
+
+def release_dates_by_version(catalog):
+    return dict(zip(catalog.versions, zip(catalog.release_days, catalog.end_of_support_days)))
+
+def changed_versions(old_catalog, new_catalog):
+    # versions that were added, removed, or had their release or end of support dates changed
+    old_dates, new_dates = release_dates_by_version(old_catalog), release_dates_by_version(new_catalog)
+    return {version for version in set(old_dates) | set(new_dates) if old_dates.get(version) != new_dates.get(version)}
+
+def first_affected_date(old_catalog, new_catalog):
+    # The earliest date on which any environment's state could differ between the two catalogs (None if they are the same).
+    # That's the earliest release of a changed version, or of the version after it - which environments on the version
+    # before it upgrade to instead
+    versions = changed_versions(old_catalog, new_catalog)
+    if not versions:
+        return None
+    affected_days = []
+    for catalog in (old_catalog, new_catalog):
+        for version in versions & set(catalog.versions):
+            position = catalog.position(version)
+            affected_days.append(catalog.release_days[position])
+            if catalog.successors[position] >= 0:
+                affected_days.append(catalog.release_days[catalog.successors[position]])
+    return pd.Timestamp(min(affected_days), unit='D')
+
+def last_upgrade_offsets(versions):
+    # offset of the day each environment moved onto the version it is on at the end of an (environments x days) array of
+    # versions; 0 for an environment that hasn't upgraded yet, which counts from its first day just like upgrade_every_x_days does
+    changes = versions[:, 1:] != versions[:, :-1]
+    return np.where(changes.any(axis=1), versions.shape[1] - 1 - np.argmax(changes[:, ::-1], axis=1), 0)
+
+def recompute(environments, environment_state, start_date, end_date, old_catalog, new_catalog):
+    # environment_state is fleet_state.compute(environments, start_date, end_date, old_catalog); returns what it would be with new_catalog
+    environments = fleet_state.validated(environments)
+    days = pd.date_range(start=start_date, end=end_date, freq='D')
+    if len(environment_state) != len(environments) * len(days):
+        raise ValueError("Expected the environment_state from fleet_state.compute for these environments and dates")
+    affected_date = first_affected_date(old_catalog, new_catalog)
+    if affected_date is None or affected_date > days[-1]:
+        return environment_state
+    if affected_date <= days[0]:
+        return fleet_state.compute(environments, start_date, end_date, new_catalog)
+    affected_offset = (affected_date - days[0]).days
+
+    # environments that started on a changed version have its old dates all through their state, so are recomputed in full
+    upgrading = (environments['policy'] == 'upgrade_every_x_days').values
+    recompute_in_full = np.zeros(len(environments), dtype=bool) # a fleet that doesn't upgrade needn't have a first_version column
+    if upgrading.any():
+        recompute_in_full = upgrading & environments['first_version'].isin(changed_versions(old_catalog, new_catalog)).values
+    resuming = upgrading & ~recompute_in_full
+    remaining_on_latest = (environments['policy'] == 'remain_on_latest').values
+
+    # version is a categorical of the old catalog's versions; its codes are moved over to the new catalog's before the suffix is written
+    old_versions = environment_state['version'].array
+    old_version_codes = np.asarray(old_versions.codes).reshape(len(environments), len(days))
+    new_version_codes = pd.Index(new_catalog.versions_in_order()).get_indexer(old_versions.categories)
+
+    k8s_version_idxs = np.empty((len(environments), len(days)-affected_offset), dtype=np.int64)
+    if resuming.any():
+        version_codes = old_version_codes[resuming, :affected_offset]
+        k8s_version_idxs[resuming] = upgrade_every_x_days.version_indexes(
+            days[affected_offset:], new_catalog.positions_of(old_versions.categories[version_codes[:, -1]]),
+            environments.loc[resuming, 'upgrade_every'].astype(np.int64).values, new_catalog,
+            last_upgrade_offsets=last_upgrade_offsets(version_codes) - affected_offset,
+        )
+    if remaining_on_latest.any():
+        k8s_version_idxs[remaining_on_latest] = remain_on_latest.latest_version_indexes(days[affected_offset:], new_catalog)
+    recomputed_suffix = environment_state_builder.state_columns(days[affected_offset:], k8s_version_idxs[~recompute_in_full], new_catalog)
+    recomputed_in_full = environment_state_builder.state_columns(
+        days, fleet_state.version_index_windows(environments[recompute_in_full], days, new_catalog)(0, len(days)), new_catalog
+    )
+
+    # only the days from affected_date onwards (and environments recomputed in full) are overwritten; a new frame is built
+    # from the column arrays without consolidating them, which would copy every column
+    columns = {column: new_version_codes[old_version_codes] if column == 'version' else environment_state[column].to_numpy() for column in recomputed_suffix}
+    for column in recomputed_suffix:
+        values = columns[column].astype(recomputed_suffix[column].dtype).reshape(len(environments), len(days))
+        values[~recompute_in_full, affected_offset:] = recomputed_suffix[column]
+        values[recompute_in_full] = recomputed_in_full[column]
+        columns[column] = values
+    return environment_state_builder.state_frame(
+        {column: environment_state[column].array for column in environment_state.columns if column not in recomputed_suffix},
+        columns, new_catalog
+    )
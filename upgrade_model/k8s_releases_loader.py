@@ -1,7 +1,113 @@
+import functools
 import os
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+import numpy as np
 import pandas as pd
 
+from upgrade_model import versions as k8s_versions
+
 K8S_RELEASE_DATE_CSV = os.path.join(os.path.dirname(__file__), 'k8s-releases.csv')
 
+def to_days(dates):
+    # days since 1970-01-01, the integer date representation used throughout the catalog
+    return np.asarray(pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int64))
+
+def _read_only(array):
+    array = np.array(array)
+    array.setflags(write=False)
+    return array
+
+@dataclass(frozen=True)
+class ReleaseCatalog:
+    versions:               np.ndarray # positions follow the rows of the csv
+    release_dates:          np.ndarray # datetime64[ns]
+    end_of_support_dates:   np.ndarray # datetime64[ns]
+    release_days:           np.ndarray # int64 days since epoch
+    end_of_support_days:    np.ndarray # int64 days since epoch
+    version_keys:           np.ndarray # (releases x 3) int64 major, minor, patch
+    version_numbers:        np.ndarray # int64 that sorts like the semantic version, see upgrade_model.versions
+    version_order:          np.ndarray # positions sorted by semantic version
+    sorted_version_numbers: np.ndarray # version_numbers[version_order], for binary searches
+    version_ranks:          np.ndarray # rank of each position in version_order
+    successors:             np.ndarray # position of the next semantic version, -1 for the newest
+    release_date_order:     np.ndarray # positions sorted by release date
+    positions:              Mapping[str, int]
+
+    @classmethod
+    def from_frame(cls, k8s_releases):
+        versions = k8s_releases['version'].values
+        release_dates = pd.DatetimeIndex(k8s_releases['release_date']).values
+        end_of_support_dates = pd.DatetimeIndex(k8s_releases['end_of_support_date']).values
+        version_keys = k8s_versions.parse_versions(versions)
+        version_numbers = k8s_versions.version_numbers(version_keys)
+
+        version_order = np.argsort(version_numbers, kind='stable')
+        version_ranks = np.empty_like(version_order)
+        version_ranks[version_order] = np.arange(len(version_order))
+        successors = np.full(len(versions), -1, dtype=np.int64)
+        successors[version_order[:-1]] = version_order[1:]
+
+        return cls(
+            versions=_read_only(versions),
+            release_dates=_read_only(release_dates),
+            end_of_support_dates=_read_only(end_of_support_dates),
+            release_days=_read_only(to_days(release_dates)),
+            end_of_support_days=_read_only(to_days(end_of_support_dates)),
+            version_keys=_read_only(version_keys),
+            version_numbers=_read_only(version_numbers),
+            version_order=_read_only(version_order),
+            sorted_version_numbers=_read_only(version_numbers[version_order]),
+            version_ranks=_read_only(version_ranks),
+            successors=_read_only(successors),
+            release_date_order=_read_only(np.argsort(release_dates, kind='stable')),
+            positions=MappingProxyType({version: position for position, version in enumerate(versions)}),
+        )
+
+    def __len__(self):
+        return len(self.versions)
+
+    def position(self, version):
+        try:
+            return self.positions[version]
+        except KeyError:
+            raise ValueError(f"Unknown k8s version {version}") from None
+
+    def positions_of(self, versions):
+        return np.array([self.position(v) for v in versions], dtype=np.int64)
+
+    def versions_in_order(self):
+        return self.versions[self.version_order]
+
+    def versions_greater_than(self, version):
+        # versions newer than version (which needn't be in the catalog), in semantic version order
+        return self.versions[self.version_order[k8s_versions.greater_than(self.sorted_version_numbers, version)]]
+
+    def versions_between(self, start_version, end_version):
+        # versions from start_version to end_version inclusive, in semantic version order
+        return self.versions[self.version_order[k8s_versions.between(self.sorted_version_numbers, start_version, end_version)]]
+
+    def released_on_or_before(self, days):
+        # position of the latest version released on or before each day, -1 if nothing had been released yet
+        release_days = self.release_days[self.release_date_order]
+        ordinals = np.searchsorted(release_days, np.asarray(days, dtype=np.int64), side='right') - 1
+        return np.where(ordinals < 0, -1, self.release_date_order[np.maximum(ordinals, 0)])
+
+    def to_frame(self):
+        return pd.DataFrame({
+            'version': self.versions.copy(),
+            'release_date': self.release_dates.copy(),
+            'end_of_support_date': self.end_of_support_dates.copy(),
+        })
+
+@functools.lru_cache(maxsize=None)
+def load_catalog(csv_path=K8S_RELEASE_DATE_CSV):
+    return ReleaseCatalog.from_frame(
+        pd.read_csv(csv_path, parse_dates=['release_date','end_of_support_date'])
+    )
+
 def load():
-    return pd.read_csv(K8S_RELEASE_DATE_CSV, parse_dates=['release_date','end_of_support_date'] )
\ No newline at end of file
+    # a fresh copy each time, so callers are free to modify it without affecting the shared catalog
+    return load_catalog().to_frame()
@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+def as_days(dates):
+    # accepts days since 1970-01-01, datetime64s, Timestamps or date strings
+    return np.asarray(dates).astype('datetime64[D]')
+
+@dataclass(frozen=True)
+class MaintenanceCalendar:
+    weekmask:       str = 'Sat Sun'        # days of the week upgrades may happen on, in numpy's busday weekmask format
+    blackout_dates: Tuple[str, ...] = ()   # dates (eg: change freezes) upgrades may not happen on, whatever the weekmask says
+
+    def _busday_kwargs(self):
+        return dict(weekmask=self.weekmask, holidays=list(self.blackout_dates))
+
+    def is_open(self, dates):
+        return np.is_busday(as_days(dates), **self._busday_kwargs())
+
+    def next_open_days(self, dates):
+        # the first day on or after each date that falls in a maintenance window
+        return np.busday_offset(as_days(dates), 0, roll='forward', **self._busday_kwargs())
+
+    def wait_days(self, dates):
+        days = as_days(dates)
+        return (self.next_open_days(days) - days).astype(np.int64)
+
+    def windows_between(self, start_date, end_date):
+        # (starts, ends) of each run of consecutive open days overlapping [start_date, end_date]; ends are exclusive
+        days = np.arange(as_days(start_date), as_days(end_date) + ONE_DAY)
+        edges = np.flatnonzero(np.diff(np.concatenate([[False], self.is_open(days), [False]]).astype(np.int8)))
+        return days[edges[0::2]], days[edges[1::2]-1] + ONE_DAY
+
+CALENDARS = {
+    'none':     MaintenanceCalendar(weekmask='1111111'),
+    'weekends': MaintenanceCalendar(weekmask='Sat Sun'),
+}
+
+def calendar_for(maintenance_window):
+    # maintenance_window is either the name of one of the standard CALENDARS or a MaintenanceCalendar
+    if isinstance(maintenance_window, MaintenanceCalendar):
+        return maintenance_window
+    try:
+        return CALENDARS[maintenance_window]
+    except KeyError:
+        raise ValueError(f"Unknown maintenance window {maintenance_window}, expected one of {list(CALENDARS)} or a MaintenanceCalendar") from None
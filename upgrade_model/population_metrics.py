@@ -0,0 +1,123 @@
+# Fleet level metrics: how a population of environments is spread across versions, release ages & support each day.
+#
+# An environment's release age & days until end of support on a given day depend only on the version it is running, so
+# everything is worked out from a (days x versions) table of how many environments run each version each day - built with
+# a single bincount over the (environments x days) state - rather than grouping the stacked environment state by date.
+# For large fleets the state can be counted a window of days at a time (see from_version_index_windows), so it is never held whole
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from upgrade_model import k8s_releases_loader
+from upgrade_model import versions as k8s_versions
+
+PERCENTILES = (10, 50, 90)
+END_OF_SUPPORT_BINS = (-np.inf, 0, 30, 90, 180, np.inf) # days until end of support
+WINDOW_DAYS = 90
+
+@dataclass
+class PopulationMetrics:
+    daily:                     pd.DataFrame # at_date, environments, supported_percentage, release_age_p<q>..., days_until_end_of_support_p<q>...
+    version_share:             pd.DataFrame # percentage of environments on each version (columns) each day (index)
+    end_of_support_histogram:  pd.DataFrame # number of environments in each END_OF_SUPPORT_BINS bin (columns) each day (index)
+
+def bin_labels(bins):
+    return [f"< {bins[1]:g}" if np.isinf(lower) else f">= {lower:g}" if np.isinf(upper) else f"{lower:g} - {upper:g}"
+            for lower, upper in zip(bins[:-1], bins[1:])]
+
+def weighted_percentiles(values, counts, percentiles):
+    # np.percentile's (linear) percentiles of each row of values, with each value repeated counts times;
+    # values must be sorted along each row. Returns a (percentiles x rows) array
+    cumulative_counts = counts.cumsum(axis=1)
+    totals = cumulative_counts[:, -1]
+    rows = np.arange(len(values))
+    def value_at_rank(ranks):
+        return values[rows, np.minimum((cumulative_counts <= ranks[:, np.newaxis]).sum(axis=1), values.shape[1]-1)]
+
+    result = np.full((len(percentiles), len(values)), np.nan)
+    for i, q in enumerate(percentiles):
+        ranks = np.maximum(totals - 1, 0) * q / 100
+        lower, upper = value_at_rank(np.floor(ranks)), value_at_rank(np.ceil(ranks))
+        result[i] = np.where(totals > 0, lower + (ranks - np.floor(ranks)) * (upper - lower), np.nan)
+    return result
+
+def from_version_counts(days, version_counts, versions, release_days, end_of_support_days,
+                        percentiles:Sequence[float]=PERCENTILES, end_of_support_bins:Sequence[float]=END_OF_SUPPORT_BINS):
+    # version_counts is a (days x versions) table of how many environments run each version each day;
+    # release_days & end_of_support_days are each version's dates, as days since 1970-01-01
+    days = pd.DatetimeIndex(np.asarray(days, dtype='datetime64[ns]'), name='at_date')
+    at_days = k8s_releases_loader.to_days(days)[:, np.newaxis]
+    release_ages = at_days - np.asarray(release_days)[np.newaxis, :]
+    days_until_end_of_support = np.asarray(end_of_support_days)[np.newaxis, :] - at_days
+    environment_counts = version_counts.sum(axis=1)
+
+    daily = pd.DataFrame({
+        'at_date': days,
+        'environments': environment_counts,
+        'supported_percentage': 100 * np.where(days_until_end_of_support >= 0, version_counts, 0).sum(axis=1) / np.maximum(environment_counts, 1),
+    })
+    for column, values in [('release_age', release_ages), ('days_until_end_of_support', days_until_end_of_support)]:
+        order = np.argsort(values[0], kind='stable') # the same every day, as every version's values move on by a day each day
+        for q, values_at_q in zip(percentiles, weighted_percentiles(values[:, order], version_counts[:, order], percentiles)):
+            daily[f'{column}_p{q:g}'] = values_at_q
+
+    version_share = pd.DataFrame(
+        100 * version_counts / np.maximum(environment_counts, 1)[:, np.newaxis], index=days, columns=pd.Index(versions, name='version')
+    )
+
+    bin_count = len(end_of_support_bins) - 1
+    bin_codes = np.digitize(days_until_end_of_support, end_of_support_bins[1:-1]) + np.arange(len(days))[:, np.newaxis] * bin_count
+    end_of_support_histogram = pd.DataFrame(
+        np.bincount(bin_codes.ravel(), weights=version_counts.ravel(), minlength=len(days)*bin_count).reshape(len(days), bin_count).astype(np.int64),
+        index=days, columns=pd.Index(bin_labels(end_of_support_bins), name='days_until_end_of_support')
+    )
+
+    return PopulationMetrics(daily=daily, version_share=version_share, end_of_support_histogram=end_of_support_histogram)
+
+def daily_counts(day_codes, codes, day_count, code_count):
+    # (days x code_count) number of environments with each code each day
+    return np.bincount((day_codes * code_count + codes).ravel(), minlength=day_count*code_count).reshape(day_count, code_count)
+
+def from_catalog_version_counts(days, version_counts, catalog, **kwargs):
+    # version_counts columns are versions in semantic version order, see catalog.version_ranks
+    return from_version_counts(
+        days, version_counts, catalog.versions[catalog.version_order],
+        catalog.release_days[catalog.version_order], catalog.end_of_support_days[catalog.version_order],
+        **kwargs
+    )
+
+def from_version_indexes(days, k8s_version_idxs, catalog, **kwargs):
+    # k8s_version_idxs is an (environments x days) array of positions in the catalog.
+    # Versions are listed in semantic version order
+    k8s_version_idxs = np.asarray(k8s_version_idxs)
+    version_counts = daily_counts(np.arange(len(days)), catalog.version_ranks[k8s_version_idxs], len(days), len(catalog))
+    return from_catalog_version_counts(days, version_counts, catalog, **kwargs)
+
+def from_version_index_windows(days, window, catalog, window_days=WINDOW_DAYS, **kwargs):
+    # window(start_offset, stop_offset) gives the (environments x days) positions in the catalog for just those days,
+    # eg: from fleet_state.version_index_windows; only one window's positions are held at a time
+    version_counts = np.empty((len(days), len(catalog)), dtype=np.int64)
+    for start_offset in range(0, len(days), window_days):
+        stop_offset = min(start_offset + window_days, len(days))
+        version_counts[start_offset:stop_offset] = daily_counts(
+            np.arange(stop_offset - start_offset), catalog.version_ranks[window(start_offset, stop_offset)], stop_offset - start_offset, len(catalog)
+        )
+    return from_catalog_version_counts(days, version_counts, catalog, **kwargs)
+
+def from_environment_state(environment_state, **kwargs):
+    # environment_state is the stacked state of any number of environments, eg: from fleet_state.compute
+    day_codes, days = pd.factorize(environment_state['at_date'], sort=True)
+    version_codes, versions = pd.factorize(environment_state['version'])
+    first_rows = np.unique(version_codes, return_index=True)[1]
+    order = k8s_versions.sorted_order(versions)
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order)) # versions listed in semantic version order
+
+    return from_version_counts(
+        days, daily_counts(day_codes, ranks[version_codes], len(days), len(versions)), np.asarray(versions)[order],
+        k8s_releases_loader.to_days(environment_state['release_date'].values[first_rows][order]),
+        k8s_releases_loader.to_days(environment_state['end_of_support_date'].values[first_rows][order]),
+        **kwargs
+    )
@@ -1,26 +1,35 @@
+import numpy as np
 import pandas as pd
+from upgrade_model import environment_state as environment_state_builder
 from upgrade_model import k8s_releases_loader
 
-k8s_releases = k8s_releases_loader.load()
-k8s_releases_by_release_date = k8s_releases.set_index('release_date')
+k8s_release_catalog = k8s_releases_loader.load_catalog()
 
-def predict_version(for_date):
-    k8s_release = k8s_releases_by_release_date.truncate(after=for_date).tail(1).reset_index()
-    release_age = (for_date - k8s_release['release_date']).dt.days
-    days_until_end_of_support = (k8s_release['end_of_support_date'] - for_date).dt.days
+def latest_version_indexes(dates, catalog=None):
+    # position in the catalog of the latest version released on or before each date (an as-of lookup)
+    catalog = k8s_release_catalog if catalog is None else catalog
+    dates = pd.DatetimeIndex(dates)
+    positions = catalog.released_on_or_before(k8s_releases_loader.to_days(dates))
+    if (positions < 0).any():
+        raise ValueError(f"No k8s version had been released by {dates[positions < 0].min().date()}")
+    return positions
 
-    return k8s_release['version'][0], k8s_release['release_date'][0], k8s_release['end_of_support_date'][0], release_age[0], days_until_end_of_support[0]
+def predict_versions(dates, catalog=None):
+    catalog = k8s_release_catalog if catalog is None else catalog
+    dates = pd.DatetimeIndex(dates)
+    positions = latest_version_indexes(dates, catalog)
 
-def compute(id, start_date, end_date):
+    return environment_state_builder.state_frame({'at_date': dates}, environment_state_builder.state_columns(dates, positions, catalog), catalog)
+
+def predict_version(for_date, catalog=None):
+    k8s_release = predict_versions([for_date], catalog)
+
+    return k8s_release['version'][0], k8s_release['release_date'][0], k8s_release['end_of_support_date'][0], k8s_release['release_age'][0], k8s_release['days_until_end_of_support'][0]
+
+def compute(id, start_date, end_date, catalog=None):
+    catalog = k8s_release_catalog if catalog is None else catalog
     days = pd.date_range(start=start_date, end=end_date, freq='D')
-    
-    environment_ids = [id]
-    environment_state = pd.DataFrame(
-        index=pd.MultiIndex.from_product([environment_ids,days],names=['environment_id','at_date'])
-        ,data=[]
-    ).reset_index() 
 
-    environment_state[['version', 'release_date', 'end_of_support_date', 'release_age', 'days_until_end_of_support']] = \
-        environment_state.apply(lambda r: predict_version(r['at_date']), axis=1, result_type="expand")
+    k8s_version_idxs = latest_version_indexes(days, catalog)[np.newaxis, :]
 
-    return environment_state
\ No newline at end of file
+    return environment_state_builder.from_version_indexes([id], days, k8s_version_idxs, catalog)
@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+caches = {} # name -> LRUCache, so their counters can be reported together
+
+def normalize(value):
+    # turns callback inputs into a hashable key where equivalent inputs (eg: [1, 2] and (1, 2), 25 and 25.0) collide
+    if isinstance(value, dict):
+        return tuple(sorted((normalize(k), normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+class LRUCache:
+    # A bounded, thread safe least-recently-used cache, shared by all the threads of a worker process
+
+    def __init__(self, name, maxsize=128):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        caches[name] = self
+
+    def get_or_compute(self, key, compute):
+        key = normalize(key)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute() # outside the lock, so a slow miss doesn't block hits in other threads
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return dict(size=len(self._entries), maxsize=self.maxsize, hits=self.hits, misses=self.misses, evictions=self.evictions)
+
+def stats():
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,103 @@
+# On-disk store for simulated fleet histories (environment_state and upgrade step tables), so results survive worker restarts.
+#
+#   <STORE_DIR>/<scenario key>/<table>.arrow        uncompressed Arrow IPC file, rows grouped by environment
+#   <STORE_DIR>/<scenario key>/<table>.index.arrow  environment_id -> (first_row, row_count)
+#
+# Tables are memory-mapped when loaded, so numeric & date columns are handed to pandas without being copied and only the
+# pages of the file that are actually used get read. String columns are dictionary encoded, and come back as categoricals.
+# The scenario key hashes the scenario's parameters together with the release catalog, so a new release never serves stale results
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from upgrade_model import k8s_releases_loader
+from upgrade_model import result_cache
+
+STORE_DIR = os.environ.get('RESULT_STORE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'precomputed', 'results'))
+ENVIRONMENT_COLUMN = 'environment_id'
+STORE_FORMAT = 2 # part of every scenario key; bump it when the tables' columns or dtypes change, so older files are never loaded
+
+def catalog_fingerprint(catalog):
+    digest = hashlib.sha256()
+    for array in (catalog.versions.astype(str), catalog.release_days, catalog.end_of_support_days):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def scenario_key(scenario, catalog=None):
+    # scenario is a dict of the parameters that (together with the catalog) fully determine a result
+    catalog = k8s_releases_loader.load_catalog() if catalog is None else catalog
+    digest = hashlib.sha256(json.dumps([STORE_FORMAT, result_cache.normalize(scenario), catalog_fingerprint(catalog)], default=str).encode())
+    return digest.hexdigest()[:16]
+
+def table_path(key, table, store_dir=None):
+    return os.path.join(STORE_DIR if store_dir is None else store_dir, key, f"{table}.arrow")
+
+def index_path(key, table, store_dir=None):
+    return table_path(key, table, store_dir)[:-len('.arrow')] + '.index.arrow'
+
+def exists(key, table, store_dir=None):
+    return os.path.exists(table_path(key, table, store_dir))
+
+def to_arrow(df):
+    arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+    return pa.table([
+        column.dictionary_encode() if pa.types.is_string(column.type) else column
+        for column in arrow_table.columns
+    ], schema=pa.schema([
+        pa.field(field.name, pa.dictionary(pa.int32(), field.type)) if pa.types.is_string(field.type) else field
+        for field in arrow_table.schema
+    ]))
+
+def write_arrow(path, arrow_table):
+    # written to a temporary file of its own first, so a reader (or another writer of the same scenario) never sees a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def read_arrow(path):
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+def save(key, table, df, store_dir=None):
+    if ENVIRONMENT_COLUMN in df.columns:
+        environment_codes, environment_ids = pd.factorize(df[ENVIRONMENT_COLUMN])
+        df = df.iloc[np.argsort(environment_codes, kind='stable')] # each environment's rows together, in order of first appearance
+        row_counts = np.bincount(environment_codes, minlength=len(environment_ids))
+        write_arrow(index_path(key, table, store_dir), pa.table({
+            ENVIRONMENT_COLUMN: pa.array(np.asarray(environment_ids).astype(str)),
+            'first_row': pa.array(np.cumsum(row_counts) - row_counts, pa.int64()),
+            'row_count': pa.array(row_counts, pa.int64()),
+        }))
+    write_arrow(table_path(key, table, store_dir), to_arrow(df.reset_index(drop=True)))
+
+def load(key, table, environment_ids=None, store_dir=None):
+    # environment_ids limits the result to those environments' rows, read as zero-copy slices of the mapped file
+    arrow_table = read_arrow(table_path(key, table, store_dir))
+    if environment_ids is not None:
+        index = read_arrow(index_path(key, table, store_dir)).to_pandas().set_index(ENVIRONMENT_COLUMN)
+        rows = index.loc[[str(environment_id) for environment_id in environment_ids]]
+        arrow_table = pa.concat_tables([arrow_table.slice(first_row, row_count) for first_row, row_count in zip(rows['first_row'], rows['row_count'])])
+    return arrow_table.to_pandas(split_blocks=True)
+
+def load_or_compute(scenario, table, compute, catalog=None, store_dir=None):
+    # Loads the stored result for a scenario, computing & storing it first if there isn't one yet
+    key = scenario_key(scenario, catalog)
+    if not exists(key, table, store_dir):
+        result = compute()
+        try:
+            save(key, table, result, store_dir)
+        except OSError:
+            return result # eg: a read-only filesystem; we'll just compute it again in the next process
+    return load(key, table, store_dir=store_dir)
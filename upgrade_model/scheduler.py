@@ -0,0 +1,96 @@
+import heapq
+from datetime import date
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+from upgrade_model import durations
+from upgrade_model import maintenance_windows
+from upgrade_model import upgrade_cycle
+from upgrade_model.upgrade_cycle import EnvironmentGroup, Fleet
+
+HORIZON_CHUNK_DAYS = 366
+
+def concurrent_upgrade_slots(max_concurrent_upgrades, group_sizes):
+    # None means every environment in a group can upgrade at once; an int applies to every group; a sequence is per group
+    if max_concurrent_upgrades is None:
+        return list(group_sizes)
+    if np.ndim(max_concurrent_upgrades) == 0:
+        max_concurrent_upgrades = [max_concurrent_upgrades] * len(group_sizes)
+    if len(max_concurrent_upgrades) != len(group_sizes):
+        raise ValueError(f"Expected max_concurrent_upgrades for {len(group_sizes)} groups, got {len(max_concurrent_upgrades)}")
+    if any(slots < 1 for slots in max_concurrent_upgrades):
+        raise ValueError("Every group needs at least 1 concurrent upgrade slot")
+    return [int(min(slots, size)) for slots, size in zip(max_concurrent_upgrades, group_sizes)]
+
+def extend_next_open_offsets(next_open_offsets, first_day, calendar):
+    # next_open_offsets[d] is the offset of the first open day on or after day offset d; it is a plain list
+    # (extended on demand) so that lookups inside the event loop stay cheap
+    days = first_day + np.arange(len(next_open_offsets), 2*len(next_open_offsets) + HORIZON_CHUNK_DAYS)
+    next_open_offsets.extend((calendar.next_open_days(days) - first_day).astype(np.int64).tolist())
+
+def schedule_upgrade_cycles(start_date:date, environment_groups:Union[Fleet, List[EnvironmentGroup]], hops:Optional[Sequence[str]]=None,
+                            upgrade_failure_percentage=1, maintenance_window='weekends',
+                            max_concurrent_upgrades:Union[None, int, Sequence[int]]=None, rng=None, duration_model=None):
+    # Event driven version of compute_next_upgrade_cycle, for many environments and many version hops in one run.
+    # Each group has a fixed number of upgrade slots; the event queue holds the days those slots next become free, and each
+    # environment (in group order) takes the earliest free slot, waits for the next maintenance window, upgrades & recovers.
+    # Groups run one after another, and each hop starts (with its own ignoring, planning & pre-work) when the previous one has finished.
+    # hops are labels (eg: "1.18.0 -> 1.19.0") prefixed onto each hop's phases; None schedules a single, unlabelled cycle.
+    # duration_model works out how long each environment takes to upgrade & recover (see upgrade_model.durations).
+    # With unlimited slots this gives the same steps as compute_next_upgrade_cycle, and the same failures for the same rng
+    rng = np.random.default_rng(rng)
+    hop_labels = [None] if hops is None else list(hops)
+    if not hop_labels:
+        raise ValueError("Expected at least one hop")
+    fleet = upgrade_cycle.as_fleet(environment_groups)
+    group_sizes = fleet.group_sizes.tolist()
+    env_count = len(fleet)
+    group_offsets = np.cumsum([0] + group_sizes[:-1]).tolist()
+    group_slots = concurrent_upgrade_slots(max_concurrent_upgrades, group_sizes)
+    phases = fleet.phases()
+    duration_model = durations.duration_model_or_default(duration_model)
+    upgrade_days = duration_model.upgrade_days(fleet.nodes, fleet.pods)
+
+    start_date = upgrade_cycle.to_datetime64(start_date)
+    first_day = start_date.astype('datetime64[D]')
+    calendar = maintenance_windows.calendar_for(maintenance_window)
+    next_open_offsets = []
+
+    hop_columns = []
+    hop_start = 0
+    for hop, hop_label in enumerate(hop_labels):
+        envs_with_upgrade_failures = upgrade_cycle.sample_upgrade_failures(rng, env_count, upgrade_failure_percentage)
+        recover_days = duration_model.recover_days(upgrade_days, envs_with_upgrade_failures)
+        busy_days = (upgrade_days + recover_days).tolist()
+
+        upgrade_starts = []
+        def upgrade_group(group, group_start):
+            slot_free_days = [group_start] * group_slots[group] # already a heap
+            group_finish = group_start
+            for i in range(group_offsets[group], group_offsets[group] + group_sizes[group]):
+                slot_free_day = slot_free_days[0]
+                while slot_free_day >= len(next_open_offsets):
+                    extend_next_open_offsets(next_open_offsets, first_day, calendar)
+                upgrade_start = next_open_offsets[slot_free_day]
+                finish = upgrade_start + busy_days[i]
+                heapq.heapreplace(slot_free_days, finish)
+                upgrade_starts.append(upgrade_start)
+                if finish > group_finish:
+                    group_finish = finish
+            return group_finish
+
+        group_starts, next_hop_start = upgrade_cycle.chain_groups(hop_start, group_sizes, upgrade_group)
+        group_starts = np.array(group_starts, dtype=np.int64)[fleet.group_ids]
+        phase_codes, step_codes, start_dates, finish_dates = upgrade_cycle.step_table_columns(
+            start_date + np.timedelta64(hop_start, 'D'),
+            start_date + group_starts.astype('timedelta64[D]'),
+            np.array(upgrade_starts, dtype=np.int64) - group_starts,
+            upgrade_days,
+            recover_days,
+        )
+        hop_columns.append((phase_codes + hop*len(phases), step_codes, start_dates, finish_dates))
+        hop_start = next_hop_start
+
+    hop_phases = [phase if hop_label is None else f"{hop_label}: {phase}" for hop_label in hop_labels for phase in phases]
+    return upgrade_cycle.step_table(hop_phases, *(np.concatenate(column) for column in zip(*hop_columns)))
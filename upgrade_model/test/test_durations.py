@@ -0,0 +1,20 @@
+import numpy as np
+
+from upgrade_model import durations
+
+def test_default_model_should_take_a_day_for_a_default_environment():
+    assert durations.DEFAULT_DURATION_MODEL.upgrade_days([3], [30]).tolist() == [1]
+
+def test_rolling_upgrades_should_scale_with_nodes_and_pods():
+    model = durations.RollingUpgradeDurations(nodes_per_batch=2, hours_per_batch=1, hours_per_pod=0.1, hours_per_day=8)
+
+    upgrade_days = model.upgrade_days(nodes=np.array([1, 16, 16, 160]), pods=np.array([0, 0, 80, 0]))
+
+    assert upgrade_days.tolist() == [1, 1, 2, 10]
+
+def test_only_failed_upgrades_should_need_recovery():
+    model = durations.FixedDurations(upgrade_day_count=2, recovery_day_count=1)
+
+    upgrade_days = model.upgrade_days(nodes=[3, 3], pods=[30, 30])
+
+    assert model.recover_days(upgrade_days, failed=np.array([True, False])).tolist() == [3, 0]
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+from pandas._testing import assert_frame_equal
+
+from upgrade_model import environment_state as environment_state_builder
+from upgrade_model import fleet_state
+from upgrade_model import remain_on_latest
+from upgrade_model import upgrade_every_x_days
+
+def test_should_stack_a_row_for_every_environment_and_day():
+    environment_state = fleet_state.compute(
+        pd.DataFrame([
+            dict(id='cluster-1', first_version='1.9.0', upgrade_every=90, policy='upgrade_every_x_days'),
+            dict(id='cluster-2', first_version='1.7.0', upgrade_every=30, policy='upgrade_every_x_days'),
+            dict(id='cluster-3', first_version=None,    upgrade_every=None, policy='remain_on_latest'),
+        ]),
+        start_date='2018-01-01', end_date='2019-01-01'
+    )
+
+    assert len(environment_state)==3*366
+    assert environment_state['environment_id'].unique().tolist() == ['cluster-1', 'cluster-2', 'cluster-3']
+
+def test_should_match_the_single_environment_models():
+    environment_state = fleet_state.compute(
+        [
+            dict(id='remain-on-latest', policy='remain_on_latest'),
+            dict(id='upgrade-every-30-days', first_version='1.7.0', upgrade_every=30, policy='upgrade_every_x_days'),
+            dict(id='upgrade-every-1-day', first_version='1.8.0', upgrade_every=1, policy='upgrade_every_x_days'),
+        ],
+        start_date='2018-01-01', end_date='2018-10-01'
+    )
+
+    assert_frame_equal(environment_state, pd.concat([
+        remain_on_latest.compute(id='remain-on-latest', start_date='2018-01-01', end_date='2018-10-01'),
+        upgrade_every_x_days.compute(id='upgrade-every-30-days', start_date='2018-01-01', end_date='2018-10-01', first_version='1.7.0', upgrade_every=30),
+        upgrade_every_x_days.compute(id='upgrade-every-1-day', start_date='2018-01-01', end_date='2018-10-01', first_version='1.8.0', upgrade_every=1),
+    ]).reset_index(drop=True).astype({'environment_id': environment_state['environment_id'].dtype}))
+
+def test_should_reject_unknown_policies():
+    with pytest.raises(ValueError):
+        fleet_state.compute([dict(id='cluster-1', policy='never_upgrade')], start_date='2018-01-01', end_date='2019-01-01')
+
+ENVIRONMENTS = [
+    dict(id='remain-on-latest', policy='remain_on_latest'),
+    dict(id='upgrade-every-30-days', first_version='1.7.0', upgrade_every=30, policy='upgrade_every_x_days'),
+    dict(id='upgrade-every-90-days', first_version='1.9.0', upgrade_every=90, policy='upgrade_every_x_days'),
+]
+
+def test_chunks_should_add_up_to_the_whole_state():
+    environment_state = fleet_state.compute(ENVIRONMENTS, start_date='2018-01-01', end_date='2019-01-01')
+
+    by_environment = list(fleet_state.compute_chunks(ENVIRONMENTS, start_date='2018-01-01', end_date='2019-01-01', chunk_rows=800))
+    by_date = list(fleet_state.compute_chunks(ENVIRONMENTS, start_date='2018-01-01', end_date='2019-01-01', chunk_rows=300, by='date'))
+
+    assert [len(chunk) for chunk in by_environment] == [732, 366]
+    assert [len(chunk) for chunk in by_date] == [300, 300, 300, 198]
+    assert_frame_equal(pd.concat(by_environment, ignore_index=True), environment_state)
+    assert_frame_equal(
+        pd.concat(by_date, ignore_index=True).sort_values(['environment_id', 'at_date'], kind='stable').reset_index(drop=True),
+        environment_state.sort_values(['environment_id', 'at_date'], kind='stable').reset_index(drop=True),
+    )
+
+def test_intervals_should_hold_each_version_change():
+    intervals = fleet_state.compute_intervals(
+        [dict(id='cluster-1', first_version='1.9.0', upgrade_every=90, policy='upgrade_every_x_days')],
+        start_date='2018-01-01', end_date='2018-12-31'
+    )
+
+    assert_frame_equal(intervals, environment_state_builder.with_state_dtypes(pd.DataFrame({
+        'environment_id': ['cluster-1'] * 5,
+        'version': ['1.9.0', '1.10.0', '1.11.0', '1.12.0', '1.13.0'],
+        'valid_from': pd.to_datetime(['2018-01-01', '2018-04-01', '2018-06-30', '2018-09-28', '2018-12-27']),
+        'valid_to': pd.to_datetime(['2018-03-31', '2018-06-29', '2018-09-27', '2018-12-26', '2018-12-31']),
+    })))
+
+def test_intervals_should_cover_every_day_of_the_state():
+    environment_state = fleet_state.compute(ENVIRONMENTS, start_date='2018-01-01', end_date='2019-01-01')
+
+    intervals = fleet_state.compute_intervals(ENVIRONMENTS, start_date='2018-01-01', end_date='2019-01-01', chunk_rows=500)
+    days_in_intervals = (intervals['valid_to'] - intervals['valid_from']).dt.days + 1
+
+    assert days_in_intervals.sum() == len(environment_state)
+    matches = environment_state.merge(intervals, on=['environment_id', 'version'])
+    matches = matches[(matches['at_date'] >= matches['valid_from']) & (matches['at_date'] <= matches['valid_to'])]
+    assert len(matches) == len(environment_state)
+
+@pytest.mark.parametrize('start_date,end_date', [('2018-01-02', '2018-01-01'), ('2018-01-01', '2017-01-01')])
+def test_intervals_should_be_empty_for_an_empty_horizon(start_date, end_date):
+    intervals = fleet_state.compute_intervals(ENVIRONMENTS, start_date=start_date, end_date=end_date)
+
+    assert len(intervals) == 0
+    assert intervals.dtypes.to_dict() == fleet_state.compute_intervals(ENVIRONMENTS, start_date='2018-01-01', end_date='2018-01-01').dtypes.to_dict()
@@ -0,0 +1,69 @@
+import pandas as pd
+from pandas._testing import assert_frame_equal
+
+from upgrade_model import fleet_state
+from upgrade_model import incremental
+from upgrade_model import k8s_releases_loader
+
+ENVIRONMENTS = [
+    dict(id='remain-on-latest', policy='remain_on_latest'),
+    dict(id='upgrade-every-30-days', first_version='1.7.0', upgrade_every=30, policy='upgrade_every_x_days'),
+    dict(id='upgrade-every-200-days', first_version='1.9.0', upgrade_every=200, policy='upgrade_every_x_days'),
+]
+
+def catalog_with(k8s_releases):
+    return k8s_releases_loader.ReleaseCatalog.from_frame(k8s_releases.reset_index(drop=True))
+
+def with_release(k8s_releases, version, release_date, end_of_support_date):
+    return catalog_with(pd.concat([k8s_releases, pd.DataFrame([dict(
+        version=version, release_date=pd.Timestamp(release_date), end_of_support_date=pd.Timestamp(end_of_support_date)
+    )])]))
+
+def test_appended_release_should_only_affect_dates_from_its_release():
+    k8s_releases = k8s_releases_loader.load()
+
+    affected_date = incremental.first_affected_date(catalog_with(k8s_releases), with_release(k8s_releases, '1.21.0', '2021-03-01', '2022-03-01'))
+
+    assert affected_date == pd.Timestamp('2021-03-01')
+
+def test_unchanged_catalog_should_affect_nothing():
+    k8s_releases = k8s_releases_loader.load()
+
+    assert incremental.first_affected_date(catalog_with(k8s_releases), catalog_with(k8s_releases.iloc[::-1])) is None
+
+def test_inserted_patch_release_should_affect_dates_from_the_release_it_replaces():
+    k8s_releases = k8s_releases_loader.load()
+    old_catalog = catalog_with(k8s_releases)
+
+    # environments on 1.15.0 that would have upgraded to 1.16.0 now wait for 1.15.1, released later
+    new_catalog = with_release(k8s_releases, '1.15.1', '2020-01-01', '2020-05-06')
+
+    assert incremental.first_affected_date(old_catalog, new_catalog) == pd.Timestamp(old_catalog.release_dates[old_catalog.position('1.16.0')])
+
+def test_recompute_should_match_computing_from_scratch():
+    k8s_releases = k8s_releases_loader.load()
+    old_catalog = catalog_with(k8s_releases)
+    environment_state = fleet_state.compute(ENVIRONMENTS, start_date='2018-01-01', end_date='2021-12-31', catalog=old_catalog)
+
+    for new_catalog in [
+        with_release(k8s_releases, '1.21.0', '2021-03-01', '2022-03-01'),
+        with_release(k8s_releases, '1.15.1', '2020-01-01', '2020-05-06'),
+        catalog_with(k8s_releases[k8s_releases.version != '1.12.0']),
+        catalog_with(k8s_releases.replace({'end_of_support_date': {pd.Timestamp('2019-06-19'): pd.Timestamp('2019-09-30')}})),
+    ]:
+        assert_frame_equal(
+            incremental.recompute(ENVIRONMENTS, environment_state, '2018-01-01', '2021-12-31', old_catalog, new_catalog),
+            fleet_state.compute(ENVIRONMENTS, start_date='2018-01-01', end_date='2021-12-31', catalog=new_catalog),
+        )
+
+def test_recompute_should_handle_a_fleet_without_upgrading_environments():
+    k8s_releases = k8s_releases_loader.load()
+    old_catalog = catalog_with(k8s_releases)
+    new_catalog = with_release(k8s_releases, '1.21.0', '2021-03-01', '2022-03-01')
+    environments = [dict(id='remain-on-latest', policy='remain_on_latest')]
+    environment_state = fleet_state.compute(environments, start_date='2020-01-01', end_date='2021-12-31', catalog=old_catalog)
+
+    assert_frame_equal(
+        incremental.recompute(environments, environment_state, '2020-01-01', '2021-12-31', old_catalog, new_catalog),
+        fleet_state.compute(environments, start_date='2020-01-01', end_date='2021-12-31', catalog=new_catalog),
+    )
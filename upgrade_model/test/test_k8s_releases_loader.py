@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from upgrade_model import k8s_releases_loader
+
+def test_should_parse_the_csv_once_per_process():
+    assert k8s_releases_loader.load_catalog() is k8s_releases_loader.load_catalog()
+
+def test_catalog_should_be_immutable():
+    k8s_release_catalog = k8s_releases_loader.load_catalog()
+
+    with pytest.raises(ValueError):
+        k8s_release_catalog.release_days[0] = 0
+    with pytest.raises(TypeError):
+        k8s_release_catalog.positions['1.99.0'] = 0
+    k8s_releases = k8s_releases_loader.load()
+    k8s_releases.loc[0, 'version'] = 'modified'
+    assert k8s_releases_loader.load().at[0, 'version'] == '1.3.0'
+
+def test_should_order_versions_semantically():
+    k8s_release_catalog = k8s_releases_loader.ReleaseCatalog.from_frame(pd.DataFrame(dict(
+        version=['1.10.0', '1.9.0', '1.11.0'],
+        release_date=pd.to_datetime(['2018-03-26', '2017-12-15', '2018-06-27']),
+        end_of_support_date=pd.to_datetime(['2018-12-03', '2018-09-27', '2019-03-25']),
+    )))
+
+    assert k8s_release_catalog.versions[k8s_release_catalog.version_order].tolist() == ['1.9.0', '1.10.0', '1.11.0']
+    assert k8s_release_catalog.successors.tolist() == [2, 0, -1]
+    assert k8s_release_catalog.position('1.11.0') == 2
+    assert k8s_release_catalog.version_keys[0].tolist() == [1, 10, 0]
+
+def test_should_look_up_the_latest_release_on_or_before_a_day():
+    k8s_release_catalog = k8s_releases_loader.load_catalog()
+    days = k8s_releases_loader.to_days(pd.to_datetime(['2016-06-30', '2016-07-01', '2018-03-25', '2018-03-26']))
+
+    positions = k8s_release_catalog.released_on_or_before(days)
+
+    assert positions[0] == -1
+    assert k8s_release_catalog.versions[positions[1:]].tolist() == ['1.3.0', '1.9.0', '1.10.0']
+    assert np.issubdtype(k8s_release_catalog.release_days.dtype, np.int64)
+
+def test_should_reject_unknown_versions():
+    with pytest.raises(ValueError):
+        k8s_releases_loader.load_catalog().position('0.0.1')
+
+def test_should_find_version_ranges_by_binary_search():
+    k8s_release_catalog = k8s_releases_loader.ReleaseCatalog.from_frame(pd.DataFrame(dict(
+        version=['1.10.0', '1.9.0', '1.11.0', '1.10.1'],
+        release_date=pd.to_datetime(['2018-03-26', '2017-12-15', '2018-06-27', '2018-04-12']),
+        end_of_support_date=pd.to_datetime(['2018-12-03', '2018-09-27', '2019-03-25', '2018-12-03']),
+    )))
+
+    assert k8s_release_catalog.versions_in_order().tolist() == ['1.9.0', '1.10.0', '1.10.1', '1.11.0']
+    assert k8s_release_catalog.versions_greater_than('1.10.0').tolist() == ['1.10.1', '1.11.0']
+    assert k8s_release_catalog.versions_greater_than('1.9.5').tolist() == ['1.10.0', '1.10.1', '1.11.0']
+    assert k8s_release_catalog.versions_greater_than('1.11.0').tolist() == []
+    assert k8s_release_catalog.versions_between('1.10.0', '1.11.0').tolist() == ['1.10.0', '1.10.1', '1.11.0']
+    assert k8s_release_catalog.versions_between('v1.2.0', '1.10.0').tolist() == ['1.9.0', '1.10.0']
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from upgrade_model import maintenance_windows
+
+def test_should_wait_until_the_weekend():
+    days = pd.date_range('2020-01-13', '2020-01-20') # Mon -> Mon
+
+    wait_days = maintenance_windows.calendar_for('weekends').wait_days(days)
+
+    assert wait_days.tolist() == [5, 4, 3, 2, 1, 0, 0, 5]
+
+def test_should_never_wait_without_restrictions():
+    days = pd.date_range('2020-01-13', '2020-01-20')
+
+    assert maintenance_windows.calendar_for('none').wait_days(days).tolist() == [0] * 8
+
+def test_should_skip_blackout_dates():
+    calendar = maintenance_windows.MaintenanceCalendar(weekmask='Sat Sun', blackout_dates=('2020-01-18', '2020-01-19'))
+
+    assert calendar.wait_days(['2020-01-17']).tolist() == [8]
+
+def test_should_find_the_windows_between_two_dates():
+    starts, ends = maintenance_windows.calendar_for('weekends').windows_between(pd.Timestamp('2020-01-05'), pd.Timestamp('2020-01-18'))
+
+    assert starts.tolist() == np.array(['2020-01-05', '2020-01-11', '2020-01-18'], dtype='datetime64[D]').tolist()
+    assert ends.tolist() == np.array(['2020-01-06', '2020-01-13', '2020-01-19'], dtype='datetime64[D]').tolist()
+
+def test_should_reject_unknown_maintenance_windows():
+    with pytest.raises(ValueError):
+        maintenance_windows.calendar_for('full-moon')
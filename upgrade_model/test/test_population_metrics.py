@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from pandas._testing import assert_frame_equal
+
+from upgrade_model import fleet_state
+from upgrade_model import k8s_releases_loader
+from upgrade_model import population_metrics
+
+environments = pd.DataFrame([
+    dict(id='cluster-1', first_version='1.9.0',  upgrade_every=90,   policy='upgrade_every_x_days'),
+    dict(id='cluster-2', first_version='1.7.0',  upgrade_every=30,   policy='upgrade_every_x_days'),
+    dict(id='cluster-3', first_version='1.8.0',  upgrade_every=365,  policy='upgrade_every_x_days'),
+    dict(id='cluster-4', first_version=None,     upgrade_every=None, policy='remain_on_latest'),
+])
+
+def test_should_match_percentiles_of_the_stacked_environment_state():
+    environment_state = fleet_state.compute(environments, start_date='2018-01-01', end_date='2019-06-30')
+    metrics = population_metrics.from_environment_state(environment_state)
+
+    by_date = environment_state.groupby('at_date')
+    for column in ['release_age', 'days_until_end_of_support']:
+        for q in population_metrics.PERCENTILES:
+            np.testing.assert_allclose(
+                metrics.daily[f'{column}_p{q}'].values,
+                by_date[column].apply(lambda values: np.percentile(values, q)).values
+            )
+    np.testing.assert_allclose(
+        metrics.daily['supported_percentage'].values,
+        by_date['days_until_end_of_support'].apply(lambda values: 100 * (values >= 0).mean()).values
+    )
+    assert (metrics.daily['environments'] == 4).all()
+    assert (metrics.end_of_support_histogram.sum(axis=1) == 4).all()
+    np.testing.assert_allclose(metrics.version_share.sum(axis=1).values, 100)
+
+def test_should_give_the_same_metrics_from_version_indexes():
+    catalog = k8s_releases_loader.load_catalog()
+    days = pd.date_range('2018-01-01', '2019-06-30', freq='D')
+    k8s_version_idxs = fleet_state.version_index_windows(fleet_state.validated(environments), days, catalog)(0, len(days))
+
+    from_indexes = population_metrics.from_version_indexes(days, k8s_version_idxs, catalog)
+    from_state = population_metrics.from_environment_state(fleet_state.compute(environments, start_date='2018-01-01', end_date='2019-06-30'))
+
+    assert_frame_equal(from_indexes.daily, from_state.daily)
+    assert_frame_equal(from_indexes.end_of_support_histogram, from_state.end_of_support_histogram)
+    assert_frame_equal(from_indexes.version_share[from_state.version_share.columns], from_state.version_share)
+    assert list(from_indexes.version_share.columns) == list(catalog.versions[catalog.version_order])
+
+def test_should_give_the_same_metrics_a_window_of_days_at_a_time():
+    catalog = k8s_releases_loader.load_catalog()
+    days = pd.date_range('2018-01-01', '2019-06-30', freq='D')
+    window = fleet_state.version_index_windows(fleet_state.validated(environments), days, catalog)
+
+    whole = population_metrics.from_version_indexes(days, window(0, len(days)), catalog)
+    windowed = population_metrics.from_version_index_windows(days, window, catalog, window_days=60)
+
+    assert_frame_equal(windowed.daily, whole.daily)
+    assert_frame_equal(windowed.version_share, whole.version_share)
+    assert_frame_equal(windowed.end_of_support_histogram, whole.end_of_support_histogram)
+
+def test_should_bin_days_until_end_of_support():
+    metrics = population_metrics.from_version_counts(
+        days=pd.DatetimeIndex(['2020-01-01']),
+        version_counts=np.array([[1, 2, 3]]),
+        versions=['1.0.0', '1.1.0', '1.2.0'],
+        release_days=np.array([0, 0, 0]),
+        end_of_support_days=k8s_releases_loader.to_days(pd.DatetimeIndex(['2019-12-01', '2020-01-21', '2020-12-31'])),
+    )
+
+    assert list(metrics.end_of_support_histogram.columns) == ['< 0', '0 - 30', '30 - 90', '90 - 180', '>= 180']
+    assert metrics.end_of_support_histogram.iloc[0].tolist() == [1, 2, 0, 0, 3]
+    assert metrics.daily.at[0, 'supported_percentage'] == 500/6
+    assert metrics.daily.at[0, 'days_until_end_of_support_p50'] == (20 + 365)/2
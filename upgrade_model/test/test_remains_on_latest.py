@@ -1,8 +1,28 @@
+from io import StringIO
 import pandas as pd
+import pytest
+from pandas._testing import assert_frame_equal
 
+from upgrade_model import environment_state as environment_state_builder
 from upgrade_model import remain_on_latest
 
 def test_should_generate_a_row_for_every_day():
     environment_state = remain_on_latest.compute(id='remain-on-latest', start_date='2018-01-01', end_date='2019-01-01')
     #print("\n",environment_state.tail(10))
     assert len(environment_state)==366
+
+def test_should_predict_the_latest_release_for_many_dates():
+    predictions = remain_on_latest.predict_versions(pd.to_datetime(['2018-03-25', '2018-03-26', '2020-01-01', '2017-01-01']))
+    #print("\n",predictions)
+
+    assert_frame_equal(predictions, environment_state_builder.with_state_dtypes(pd.read_csv(StringIO('''
+at_date     version  release_date end_of_support_date  release_age days_until_end_of_support
+2018-03-25  1.9.0    2017-12-15   2018-09-27           100         186
+2018-03-26  1.10.0   2018-03-26   2018-12-03           0           252
+2020-01-01  1.17.0   2019-12-09   2020-09-30           23          273
+2017-01-01  1.5.0    2016-12-13   2017-09-29           19          271
+'''), sep=r'\s+', parse_dates=['at_date', 'release_date', 'end_of_support_date'])))
+
+def test_should_not_predict_a_version_before_the_first_release():
+    with pytest.raises(ValueError):
+        remain_on_latest.predict_versions(pd.to_datetime(['2016-01-01']))
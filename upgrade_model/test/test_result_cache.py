@@ -0,0 +1,30 @@
+from upgrade_model import result_cache
+
+def test_should_only_compute_each_key_once():
+    cache = result_cache.LRUCache('test-compute-once', maxsize=2)
+    computed = []
+    def compute(value):
+        computed.append(value)
+        return value * 2
+
+    assert cache.get_or_compute(('a', 1), lambda: compute(1)) == 2
+    assert cache.get_or_compute(['a', 1.0], lambda: compute(1)) == 2
+
+    assert computed == [1]
+    assert cache.stats() == dict(size=1, maxsize=2, hits=1, misses=1, evictions=0)
+
+def test_should_evict_the_least_recently_used_entry():
+    cache = result_cache.LRUCache('test-eviction', maxsize=2)
+
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('c', lambda: 3) # evicts b
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+
+    assert cache.stats() == dict(size=2, maxsize=2, hits=2, misses=4, evictions=2)
+    assert result_cache.stats()['test-eviction']['evictions'] == 2
+
+def test_should_normalize_nested_inputs():
+    assert result_cache.normalize({'b': [1, 2.0], 'a': None}) == (('a', None), ('b', (1, 2)))
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from pandas._testing import assert_frame_equal
+
+from upgrade_model import fleet_state
+from upgrade_model import result_store
+from upgrade_model.benchmark.synthetic_releases import synthetic_catalog
+
+ENVIRONMENTS = [
+    dict(id='cluster-1', first_version='1.9.0', upgrade_every=90, policy='upgrade_every_x_days'),
+    dict(id='cluster-2', policy='remain_on_latest'),
+    dict(id='cluster-3', first_version='1.7.0', upgrade_every=30, policy='upgrade_every_x_days'),
+]
+
+def test_should_load_what_was_saved(tmp_path):
+    environment_state = fleet_state.compute(ENVIRONMENTS, start_date='2018-01-01', end_date='2019-01-01')
+
+    result_store.save('scenario', 'environment_state', environment_state, store_dir=tmp_path)
+
+    assert_frame_equal(result_store.load('scenario', 'environment_state', store_dir=tmp_path), environment_state)
+
+def test_should_load_just_the_requested_environments(tmp_path):
+    environment_state = fleet_state.compute(ENVIRONMENTS, start_date='2018-01-01', end_date='2019-01-01')
+    result_store.save('scenario', 'environment_state', environment_state, store_dir=tmp_path)
+
+    loaded = result_store.load('scenario', 'environment_state', environment_ids=['cluster-3', 'cluster-1'], store_dir=tmp_path)
+
+    assert_frame_equal(loaded, pd.concat([
+        environment_state[environment_state.environment_id == 'cluster-3'],
+        environment_state[environment_state.environment_id == 'cluster-1'],
+    ]).reset_index(drop=True))
+
+def test_should_only_compute_a_scenario_once(tmp_path):
+    computed = []
+    def compute():
+        computed.append(1)
+        return fleet_state.compute(ENVIRONMENTS, start_date='2018-01-01', end_date='2018-02-01')
+
+    first = result_store.load_or_compute(dict(environments=ENVIRONMENTS), 'environment_state', compute, store_dir=tmp_path)
+    second = result_store.load_or_compute(dict(environments=ENVIRONMENTS), 'environment_state', compute, store_dir=tmp_path)
+
+    assert len(computed) == 1
+    assert_frame_equal(first, second)
+
+def test_should_save_the_same_scenario_from_concurrent_writers(tmp_path):
+    environment_state = fleet_state.compute(ENVIRONMENTS, start_date='2018-01-01', end_date='2019-01-01')
+
+    with ThreadPoolExecutor(8) as writers:
+        list(writers.map(lambda _: result_store.save('scenario', 'environment_state', environment_state, store_dir=tmp_path), range(16)))
+
+    assert_frame_equal(result_store.load('scenario', 'environment_state', store_dir=tmp_path), environment_state)
+    assert sorted(path.name for path in (tmp_path / 'scenario').iterdir()) == ['environment_state.arrow', 'environment_state.index.arrow']
+
+def test_scenario_key_should_change_with_the_catalog():
+    scenario = dict(environments=ENVIRONMENTS, start_date='2018-01-01')
+
+    assert result_store.scenario_key(scenario) == result_store.scenario_key(dict(scenario))
+    assert result_store.scenario_key(scenario) != result_store.scenario_key(scenario, catalog=synthetic_catalog(20))
+    assert result_store.scenario_key(scenario) != result_store.scenario_key(dict(scenario, start_date='2018-01-02'))
@@ -0,0 +1,84 @@
+from io import StringIO
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pandas._testing import assert_frame_equal
+
+from upgrade_model import scheduler
+from upgrade_model import upgrade_cycle
+
+def parse_steps(csv_data):
+    return upgrade_cycle.with_step_dtypes(pd.read_csv(
+      StringIO(csv_data), sep = r'\s+',
+      parse_dates=['start_date', 'finish_date']
+    ))
+
+def environment_groups(group_count, environments_per_group):
+    return [
+        upgrade_cycle.EnvironmentGroup(f'Group {i + 1}', [
+            upgrade_cycle.Environment(f'Cluster {i * environments_per_group + j + 1}') for j in range(environments_per_group)
+        ]) for i in range(group_count)
+    ]
+
+def test_should_match_compute_next_upgrade_cycle_without_slot_limits():
+    for maintenance_window in ['weekends', 'none']:
+        for upgrade_failure_percentage in [0, 0.3, 1]:
+            expected = upgrade_cycle.compute_next_upgrade_cycle(datetime(2020, 1, 4), environment_groups(3, 4),
+                                                                upgrade_failure_percentage, maintenance_window, rng=42)
+
+            steps = scheduler.schedule_upgrade_cycles(datetime(2020, 1, 4), environment_groups(3, 4),
+                                                      upgrade_failure_percentage=upgrade_failure_percentage,
+                                                      maintenance_window=maintenance_window, rng=42)
+
+            assert_frame_equal(steps, expected)
+
+def test_should_chain_hops_one_after_another():
+    hops = ['1.17.0 -> 1.18.0', '1.18.0 -> 1.19.0', '1.19.0 -> 1.20.0']
+    rng = np.random.default_rng(7)
+    expected = []
+    next_start_date = datetime(2020, 1, 1)
+    for hop in hops:
+        hop_steps = upgrade_cycle.compute_next_upgrade_cycle(next_start_date, environment_groups(2, 3), 0.2, rng=rng)
+        hop_steps.phase = f"{hop}: " + hop_steps.phase.astype(str)
+        expected.append(hop_steps)
+        next_start_date = hop_steps.finish_date.max()
+
+    steps = scheduler.schedule_upgrade_cycles(datetime(2020, 1, 1), environment_groups(2, 3), hops, upgrade_failure_percentage=0.2, rng=7)
+
+    assert_frame_equal(steps, upgrade_cycle.with_step_dtypes(pd.concat(expected).reset_index(drop=True)))
+
+def test_should_queue_upgrades_for_free_slots_and_maintenance_windows():
+    steps = scheduler.schedule_upgrade_cycles(
+        start_date = datetime.fromisoformat('2020-01-01'),
+        environment_groups = environment_groups(1, 3),
+        upgrade_failure_percentage = 0,
+        max_concurrent_upgrades = 1,
+    )
+    # print("\n",steps)
+
+    assert_frame_equal(steps, parse_steps('''
+phase                 step       start_date   finish_date
+Global                ignoring   2020-01-01  2020-01-15
+Global                planning   2020-01-15  2020-01-16
+Global                pre-work   2020-01-16  2020-01-17
+"Group 1: Cluster 1"  waiting    2020-01-17  2020-01-18
+"Group 1: Cluster 1"  upgrading  2020-01-18  2020-01-19
+"Group 1: Cluster 1"  recovering 2020-01-19  2020-01-19
+"Group 1: Cluster 2"  waiting    2020-01-17  2020-01-19
+"Group 1: Cluster 2"  upgrading  2020-01-19  2020-01-20
+"Group 1: Cluster 2"  recovering 2020-01-20  2020-01-20
+"Group 1: Cluster 3"  waiting    2020-01-17  2020-01-25
+"Group 1: Cluster 3"  upgrading  2020-01-25  2020-01-26
+"Group 1: Cluster 3"  recovering 2020-01-26  2020-01-26
+'''))
+
+def test_should_take_longer_to_upgrade_larger_environments():
+    steps = scheduler.schedule_upgrade_cycles(datetime(2020, 1, 1), [
+        upgrade_cycle.EnvironmentGroup('Group 1', [
+            upgrade_cycle.Environment('Small', nodes=3, pods=30),
+            upgrade_cycle.Environment('Large', nodes=300, pods=3000),
+        ])
+    ], upgrade_failure_percentage=0, maintenance_window='none')
+
+    upgrading = steps[steps.step == 'upgrading']
+    assert (upgrading.finish_date - upgrading.start_date).dt.days.tolist() == [1, 14]
@@ -1,15 +1,16 @@
 from io import StringIO
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from pandas._testing import assert_frame_equal
 
 from upgrade_model import upgrade_cycle
 
 def parse_steps(csv_data):
-    return pd.read_csv(
+    return upgrade_cycle.with_step_dtypes(pd.read_csv(
       StringIO(csv_data), sep = r'\s+',
       parse_dates=['start_date', 'finish_date']
-    )
+    ))
 
 def test_single_cluster_should_contain_all_the_steps():
 
@@ -90,4 +91,117 @@ def test_chance_of_upgrade_failure():
     recover_steps = steps[steps.step == 'recovering']
     # print("\n",recover_steps)
 
-    assert len(recover_steps[recover_steps.step_length != '0 days']) == 3
\ No newline at end of file
+    assert len(recover_steps[recover_steps.step_length != '0 days']) == 3
+
+def test_monte_carlo_should_match_a_single_cycle_when_every_upgrade_fails():
+    environment_groups = [
+        upgrade_cycle.EnvironmentGroup('Group 1', [upgrade_cycle.Environment('Cluster 1'), upgrade_cycle.Environment('Cluster 2')]),
+        upgrade_cycle.EnvironmentGroup('Group 2', [upgrade_cycle.Environment('Cluster 3'), upgrade_cycle.Environment('Cluster 4')]),
+    ]
+
+    distribution = upgrade_cycle.simulate_upgrade_cycles(
+        start_date = datetime.fromisoformat('2020-01-01'),
+        environment_groups = environment_groups,
+        trials = 100,
+        upgrade_failure_percentage = 1,
+        seed = 1
+    )
+
+    assert distribution.cycle_days.tolist() == [27] * 100 # 2020-01-01 to 2020-01-28, see test_multi_group_and_cluster_should_contain_all_the_steps
+
+
+def test_monte_carlo_should_be_reproducible_from_a_seed():
+    environment_groups = [
+        upgrade_cycle.EnvironmentGroup(f'Group {g+1}', [upgrade_cycle.Environment(f'Cluster {i+1}') for i in range(5)]) for g in range(4)
+    ]
+    def simulate(seed, processes=None):
+        return upgrade_cycle.simulate_upgrade_cycles(
+            start_date = datetime.fromisoformat('2020-01-01'),
+            environment_groups = environment_groups,
+            trials = 2500,
+            upgrade_failure_percentage = 0.25,
+            seed = seed,
+            processes = processes
+        )
+
+    distribution = simulate(seed=42)
+
+    assert len(distribution.cycle_days) == 2500
+    assert distribution.p50 <= distribution.p90 <= distribution.p99
+    assert distribution.cycle_days.tolist() == simulate(seed=42).cycle_days.tolist()
+    assert distribution.cycle_days.tolist() == simulate(seed=42, processes=2).cycle_days.tolist()
+    assert distribution.cycle_days.tolist() != simulate(seed=43).cycle_days.tolist()
+
+
+def test_same_seed_should_give_the_same_upgrade_failures():
+    environment_groups = [
+        upgrade_cycle.EnvironmentGroup('Group 1', [upgrade_cycle.Environment(f'Cluster {i+1}') for i in range(20)])
+    ]
+    def compute(rng):
+        return upgrade_cycle.compute_next_upgrade_cycle(
+            start_date = datetime.fromisoformat('2020-01-01'),
+            environment_groups = environment_groups,
+            upgrade_failure_percentage = 0.5,
+            rng = rng
+        )
+
+    assert_frame_equal(compute(rng=7), compute(rng=7))
+    assert_frame_equal(compute(rng=np.random.default_rng(7)), compute(rng=7))
+    assert not compute(rng=7).equals(compute(rng=8))
+
+def test_larger_environments_should_hold_up_their_group():
+    environment_groups = [
+        upgrade_cycle.EnvironmentGroup('Group 1', [
+            upgrade_cycle.Environment('Small', nodes=3, pods=30),
+            upgrade_cycle.Environment('Large', nodes=120, pods=200),
+        ]),
+        upgrade_cycle.EnvironmentGroup('Group 2', [upgrade_cycle.Environment('Cluster 3')]),
+    ]
+
+    steps = upgrade_cycle.compute_next_upgrade_cycle(datetime(2020, 1, 1), environment_groups, upgrade_failure_percentage=0, maintenance_window='none')
+    cycle_days = upgrade_cycle.simulate_upgrade_cycles(datetime(2020, 1, 1), environment_groups, trials=10, upgrade_failure_percentage=0,
+                                                       maintenance_window='none', seed=0).cycle_days
+
+    group_2 = steps[steps.phase == 'Group 2: Cluster 3']
+    assert group_2.start_date.min() == pd.Timestamp('2020-01-21') # 16 global days + 4 days to upgrade the large environment
+    assert cycle_days.tolist() == [21] * 10
+
+def test_fleet_should_hold_the_same_environments_as_its_groups():
+    fleet = upgrade_cycle.Fleet.from_groups([
+        upgrade_cycle.EnvironmentGroup('Group 1', [upgrade_cycle.Environment('Cluster 1'), upgrade_cycle.Environment('Cluster 2', nodes=10)]),
+        upgrade_cycle.EnvironmentGroup('Empty', []),
+        upgrade_cycle.EnvironmentGroup('Group 3', [upgrade_cycle.Environment('Cluster 3', pods=5)]),
+    ])
+
+    assert fleet.group_sizes.tolist() == [2, 0, 1]
+    assert fleet.ids.tolist() == [0, 1, 2]
+    assert fleet.nodes.tolist() == [3, 10, 3]
+    assert fleet.pods.tolist() == [30, 30, 5]
+    assert fleet.phases() == ['Global', 'Group 1: Cluster 1', 'Group 1: Cluster 2', 'Group 3: Cluster 3']
+
+def test_models_should_accept_a_fleet():
+    environment_groups = [
+        upgrade_cycle.EnvironmentGroup(f'Group {i + 1}', [
+            upgrade_cycle.Environment(f'Cluster {i * 3 + j + 1}') for j in range(3)
+        ]) for i in range(4)
+    ]
+    fleet = upgrade_cycle.Fleet.uniform(group_count=4, environments_per_group=3)
+
+    assert_frame_equal(
+        upgrade_cycle.compute_next_upgrade_cycle(datetime(2020, 1, 1), fleet, upgrade_failure_percentage=0.25, rng=3),
+        upgrade_cycle.compute_next_upgrade_cycle(datetime(2020, 1, 1), environment_groups, upgrade_failure_percentage=0.25, rng=3),
+    )
+    assert np.array_equal(
+        upgrade_cycle.simulate_upgrade_cycles(datetime(2020, 1, 1), fleet, trials=100, upgrade_failure_percentage=0.25, seed=3).cycle_days,
+        upgrade_cycle.simulate_upgrade_cycles(datetime(2020, 1, 1), environment_groups, trials=100, upgrade_failure_percentage=0.25, seed=3).cycle_days,
+    )
+
+def test_groups_should_start_when_the_one_before_them_has_finished():
+    global_days = upgrade_cycle.IGNORE_DAYS + upgrade_cycle.PLAN_DAYS + upgrade_cycle.PREWORK_DAYS
+    group_busy_days = upgrade_cycle.group_busy_days_for([2, 0, 1], np.array([3, 5, 4]))
+
+    group_start_days, end_day = upgrade_cycle.chain_groups(100, [2, 0, 1], lambda group, start_day: start_day + group_busy_days[group])
+
+    assert group_busy_days.tolist() == [5, 0, 4]
+    assert group_start_days == [100 + global_days, 105 + global_days, 105 + global_days]
+    assert end_day == 109 + global_days
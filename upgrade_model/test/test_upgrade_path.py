@@ -0,0 +1,38 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from pandas._testing import assert_frame_equal
+
+from upgrade_model import upgrade_cycle
+from upgrade_model import upgrade_path
+
+def test_should_match_compute_next_upgrade_cycle_for_each_hop_in_turn():
+    environment_groups = upgrade_cycle.Fleet.uniform(3, 4, nodes=[1, 3, 20, 50]*3)
+    rng = np.random.default_rng(11)
+    expected = []
+    next_start_date = datetime(2020, 3, 1)
+    for hop in ['1.12.0 -> 1.13.0', '1.13.0 -> 1.14.0', '1.14.0 -> 1.15.0', '1.15.0 -> 1.16.0']:
+        hop_steps = upgrade_cycle.compute_next_upgrade_cycle(next_start_date, environment_groups, 0.25, rng=rng)
+        hop_steps.phase = f"{hop}: " + hop_steps.phase.astype(str)
+        expected.append(hop_steps)
+        next_start_date = hop_steps.finish_date.max()
+
+    steps = upgrade_path.plan(datetime(2020, 3, 1), '1.12.0', '1.16.0', environment_groups, 0.25, rng=11).step_table()
+
+    assert_frame_equal(steps, upgrade_cycle.with_step_dtypes(pd.concat(expected).reset_index(drop=True)))
+
+def test_should_answer_when_each_environment_reaches_the_target_and_how_long_it_was_off_support():
+    environment_groups = [upgrade_cycle.EnvironmentGroup('Group 1', [upgrade_cycle.Environment('Cluster 1')])]
+
+    path = upgrade_path.plan(datetime(2020, 3, 20), '1.15.0', '1.17.0', environment_groups,
+                             upgrade_failure_percentage=0, maintenance_window='none')
+
+    assert path.hops == ['1.15.0 -> 1.16.0', '1.16.0 -> 1.17.0']
+    assert path.target_reached_dates().to_dict() == {'Cluster 1': pd.Timestamp('2020-04-23')}
+    # 1.15.0 went out of support on 2020-03-24 and the first hop finished on 2020-04-06
+    assert path.off_support_days().loc['Cluster 1'].tolist() == [13, 0]
+
+def test_should_reject_paths_without_a_hop():
+    with pytest.raises(ValueError):
+        upgrade_path.plan(datetime(2020, 3, 1), '1.16.0', '1.16.0', upgrade_cycle.Fleet.uniform(1, 1))
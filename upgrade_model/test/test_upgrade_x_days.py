@@ -2,14 +2,15 @@ from io import StringIO
 import pandas as pd
 from pandas._testing import assert_frame_equal
 
+from upgrade_model import environment_state as environment_state_builder
 from upgrade_model import upgrade_every_x_days
 
 def parse_environment_state(csv_data):
     TESTDATA = StringIO(csv_data)
-    return pd.read_csv(
+    return environment_state_builder.with_state_dtypes(pd.read_csv(
       TESTDATA, sep = r'\s+',
       parse_dates=['at_date', 'release_date', 'end_of_support_date']
-    )
+    ))
 
 def rows_with_changes_in(df, column):
     return df[df[column].ne(df[column].shift())]
@@ -50,4 +51,25 @@ upgrade-every-1-day 2018-01-02   1.9.0   2017-12-15   2018-09-27           18
 upgrade-every-1-day 2018-03-26  1.10.0   2018-03-26   2018-12-03            0          252
 upgrade-every-1-day 2018-06-27  1.11.0   2018-06-27   2019-03-25            0          271 
 upgrade-every-1-day 2018-09-27  1.12.0   2018-09-27   2019-06-19            0          265
-''').reset_index(drop=True))
\ No newline at end of file
+''').reset_index(drop=True))
+
+def test_should_stay_on_latest_version_when_no_newer_release_exists():
+    environment_state = upgrade_every_x_days.compute(
+        id='upgrade-every-30-days', start_date='2020-01-01', end_date='2021-12-31', 
+        first_version='1.18.0', upgrade_every=30
+    )
+    # print("\n",rows_with_changes_in(environment_state,'version'))
+
+    assert_frame_equal(rows_with_changes_in(environment_state,'version').reset_index(drop=True), parse_environment_state('''
+environment_id          at_date     version release_date  end_of_support_date  release_age days_until_end_of_support
+upgrade-every-30-days   2020-01-01  1.18.0  2020-03-25    2021-01-30           -84         395
+upgrade-every-30-days   2020-08-26  1.19.0  2020-08-26    2021-08-30           0           369
+''').reset_index(drop=True))
+    assert len(environment_state)==731
+
+def test_upgrade_events_should_list_the_day_of_each_upgrade():
+    days = pd.date_range(start='2018-01-01', end='2018-03-15', freq='D')
+    event_offsets, event_version_idxs = upgrade_every_x_days.upgrade_events(days, first_version_idx=4, upgrade_every=30)
+
+    assert event_offsets.tolist() == [0, 30, 60]
+    assert event_version_idxs.tolist() == [4, 5, 6]
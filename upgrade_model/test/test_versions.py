@@ -0,0 +1,21 @@
+import numpy as np
+
+from upgrade_model import versions
+
+def test_should_parse_versions_into_integers():
+    assert versions.parse_version('v1.18.2') == (1, 18, 2)
+    assert versions.parse_versions(['1.9.0', '1.10.3']).tolist() == [[1, 9, 0], [1, 10, 3]]
+
+def test_version_numbers_should_sort_like_the_versions():
+    unsorted_versions = ['1.10.0', '2.0.0', '1.9.0', '1.10.10', '1.10.2', '0.99.99']
+
+    assert [unsorted_versions[i] for i in versions.sorted_order(unsorted_versions)] == ['0.99.99', '1.9.0', '1.10.0', '1.10.2', '1.10.10', '2.0.0']
+    assert versions.version_number('1.10.0') > versions.version_number('1.9.99')
+
+def test_should_slice_sorted_version_numbers():
+    sorted_version_numbers = versions.version_numbers(versions.parse_versions(['1.8.0', '1.9.0', '1.10.0', '1.11.0']))
+
+    assert versions.greater_than(sorted_version_numbers, '1.9.0') == slice(2, 4)
+    assert versions.between(sorted_version_numbers, '1.9.0', '1.10.0') == slice(1, 3)
+    assert versions.between(sorted_version_numbers, '1.12.0', '1.13.0') == slice(4, 4)
+    assert np.all(np.diff(sorted_version_numbers) > 0)
@@ -1,13 +1,14 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime
 from datetime import date
-from datetime import timedelta
-import random
 import uuid
-import calendar
+from concurrent.futures import ProcessPoolExecutor
 
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional, Union
+
+from upgrade_model import durations
+from upgrade_model import maintenance_windows
 
 @dataclass
 class Environment:
@@ -25,43 +26,249 @@ class EnvironmentGroup:
     name:         str
     environments: List[Environment]
 
-def compute_next_upgrade_cycle(start_date:date, environment_groups:List[EnvironmentGroup], upgrade_failure_percentage=1, maintenance_window='weekends'):
-    ignore_days = 14
-    plan_days = 1
-    prework_days = 1
-
-    df_steps = pd.DataFrame([
-        dict(phase="Global", step="ignoring", start_date=start_date,                                         finish_date=start_date + timedelta(days=ignore_days)),
-        dict(phase="Global", step="planning", start_date=start_date + timedelta(days=ignore_days),           finish_date=start_date + timedelta(days=ignore_days+plan_days)),
-        dict(phase="Global", step="pre-work", start_date=start_date + timedelta(days=ignore_days+plan_days), finish_date=start_date + timedelta(days=ignore_days+plan_days+prework_days)),
-    ])
-
-    all_envs = []
-    for group in environment_groups:
-        all_envs.extend([env for env in group.environments])
-    envs_with_upgrade_failures = random.sample(all_envs, round(len(all_envs)*upgrade_failure_percentage))
-    
-    for group in environment_groups:
-        group_start_date = df_steps.finish_date.max()
-        for env in group.environments:
-            upgrade_days     = 1 # TODO: this should be based on the size of the environment
-           
-            if maintenance_window == 'weekends':
-                wait_days = max(0,calendar.SATURDAY - group_start_date.weekday()) #days til Sat or 0 if Sunday
-            else:
-                wait_days = 0
-           
-            if env in envs_with_upgrade_failures:
-                recover_days = 1 + upgrade_days # Assume recover takes 1 day + having to rerun original upgrade
-            else:
-                recover_days = 0
-
-            df_steps = pd.concat([df_steps, 
-                pd.DataFrame([
-                    dict(phase=f"{group.name}: {env.name}", step="waiting",    start_date=group_start_date,                                          finish_date=group_start_date + timedelta(days=wait_days)),
-                    dict(phase=f"{group.name}: {env.name}", step="upgrading",  start_date=group_start_date + timedelta(days=wait_days),              finish_date=group_start_date + timedelta(days=wait_days+upgrade_days)),
-                    dict(phase=f"{group.name}: {env.name}", step="recovering", start_date=group_start_date + timedelta(days=wait_days+upgrade_days), finish_date=group_start_date + timedelta(days=wait_days+upgrade_days+recover_days)),
-                ])
-            ])
- 
-    return df_steps.reset_index(drop=True)
\ No newline at end of file
+class Fleet:
+    # Struct-of-arrays alternative to a list of EnvironmentGroups, for fleets too large to hold as one object per environment.
+    # One entry per environment in group order (so each group is a contiguous run of group_ids); ids are just integer positions
+    __slots__ = ('group_names', 'group_ids', 'names', 'nodes', 'pods', 'ids')
+
+    def __init__(self, group_names, group_ids, names, nodes=3, pods=30):
+        self.group_names = np.asarray(group_names, dtype=object)
+        self.group_ids = np.asarray(group_ids, dtype=np.int64)
+        self.names = np.asarray(names, dtype=object)
+        self.nodes = np.broadcast_to(np.asarray(nodes, dtype=np.int64), self.names.shape)
+        self.pods = np.broadcast_to(np.asarray(pods, dtype=np.int64), self.names.shape)
+        self.ids = np.arange(len(self.names))
+        if len(self.group_ids) != len(self.names):
+            raise ValueError(f"Expected a group id for each of the {len(self.names)} environments, got {len(self.group_ids)}")
+        if np.any(np.diff(self.group_ids) < 0) or np.any(self.group_ids < 0) or np.any(self.group_ids >= len(self.group_names)):
+            raise ValueError("group_ids must be positions in group_names, in group order")
+
+    @classmethod
+    def from_groups(cls, environment_groups:List[EnvironmentGroup]):
+        return cls(
+            group_names=[group.name for group in environment_groups],
+            group_ids=np.repeat(np.arange(len(environment_groups)), [len(group.environments) for group in environment_groups]),
+            names=[env.name for group in environment_groups for env in group.environments],
+            nodes=[env.nodes for group in environment_groups for env in group.environments],
+            pods=[env.pods for group in environment_groups for env in group.environments],
+        )
+
+    @classmethod
+    def uniform(cls, group_count, environments_per_group, nodes=3, pods=30):
+        # "Group 1" .. "Group n", each with environments_per_group clusters numbered across the whole fleet
+        return cls(
+            group_names=[f'Group {i + 1}' for i in range(group_count)],
+            group_ids=np.repeat(np.arange(group_count), environments_per_group),
+            names=[f'Cluster {i + 1}' for i in range(group_count * environments_per_group)],
+            nodes=nodes,
+            pods=pods,
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def group_sizes(self):
+        return np.bincount(self.group_ids, minlength=len(self.group_names))
+
+    def phases(self):
+        return [GLOBAL_PHASE] + [f"{group_name}: {name}" for group_name, name in zip(self.group_names[self.group_ids], self.names)]
+
+def as_fleet(environment_groups):
+    # the models accept either a Fleet or a list of EnvironmentGroups
+    return environment_groups if isinstance(environment_groups, Fleet) else Fleet.from_groups(environment_groups)
+
+STEPS = ['ignoring', 'planning', 'pre-work', 'waiting', 'upgrading', 'recovering']
+GLOBAL_PHASE = 'Global'
+
+def to_datetime64(d):
+    return pd.Timestamp(d).to_datetime64()
+
+IGNORE_DAYS = 14
+PLAN_DAYS = 1
+PREWORK_DAYS = 1
+
+MONTE_CARLO_CHUNK_TRIALS = 1000
+
+def wait_days_for(days, maintenance_window):
+    # days (since 1970-01-01) until the next maintenance window opens, 0 if it is already open
+    return maintenance_windows.calendar_for(maintenance_window).wait_days(days)
+
+def to_seed_sequence(seed):
+    # accepts anything np.random.default_rng does: None, an int, a SeedSequence or a Generator
+    if isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(seed.integers(2**63))
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+def sample_upgrade_failures(rng, env_count, upgrade_failure_percentage):
+    envs_with_upgrade_failures = np.zeros(env_count, dtype=bool)
+    envs_with_upgrade_failures[rng.choice(env_count, size=round(env_count*upgrade_failure_percentage), replace=False)] = True
+    return envs_with_upgrade_failures
+
+def group_busy_days_for(group_sizes, busy_days):
+    # (... x groups) days from each group starting its upgrades until its slowest environment has finished; 0 for empty groups
+    group_busy_days = np.zeros(busy_days.shape[:-1] + (len(group_sizes),), dtype=np.int64)
+    non_empty_groups = np.flatnonzero(group_sizes)
+    if len(non_empty_groups):
+        group_offsets = np.cumsum(np.concatenate([[0], group_sizes[:-1]])).astype(np.int64)
+        group_busy_days[..., non_empty_groups] = np.maximum.reduceat(busy_days, group_offsets[non_empty_groups], axis=-1)
+    return group_busy_days
+
+def chain_groups(cycle_start_day, group_sizes, upgrade_group):
+    # Groups upgrade one after another: the first starts after the cycle's global steps, and each of the others when the one
+    # before it has finished. upgrade_group(group, start_day) returns the day that (non-empty) group finished; empty groups take
+    # no time. Days can be ints or arrays (eg: one per Monte Carlo trial). Returns each group's start day & the cycle's end day
+    group_start_days = []
+    group_start_day = cycle_start_day + IGNORE_DAYS + PLAN_DAYS + PREWORK_DAYS
+    for group, group_size in enumerate(group_sizes):
+        group_start_days.append(group_start_day)
+        if group_size:
+            group_start_day = upgrade_group(group, group_start_day)
+    return group_start_days, group_start_day
+
+def compute_next_upgrade_cycle(start_date:date, environment_groups:Union[Fleet, List[EnvironmentGroup]], upgrade_failure_percentage=1, maintenance_window='weekends', rng=None,
+                               duration_model=None):
+    # rng can be a numpy Generator or a seed; the same seed always gives the same upgrade failures.
+    # duration_model works out how long each environment takes to upgrade & recover (see upgrade_model.durations)
+    rng = np.random.default_rng(rng)
+    duration_model = durations.duration_model_or_default(duration_model)
+
+    fleet = as_fleet(environment_groups)
+    group_sizes = fleet.group_sizes
+    env_count = len(fleet)
+    phases = fleet.phases()
+
+    envs_with_upgrade_failures = sample_upgrade_failures(rng, env_count, upgrade_failure_percentage)
+
+    upgrade_days = duration_model.upgrade_days(fleet.nodes, fleet.pods)
+    recover_days = duration_model.recover_days(upgrade_days, envs_with_upgrade_failures)
+
+    # Within a group every environment shares the same start & wait for the next maintenance window
+    group_busy_days = group_busy_days_for(group_sizes, upgrade_days + recover_days)
+    group_wait_days = np.zeros(len(group_sizes), dtype=np.int64)
+    def upgrade_group(group, group_start_day):
+        group_wait_days[group] = wait_days_for(group_start_day, maintenance_window)
+        return group_start_day + group_wait_days[group] + group_busy_days[group]
+
+    start_date = to_datetime64(start_date)
+    start_day = int(start_date.astype('datetime64[D]').astype(np.int64))
+    group_start_days, _ = chain_groups(start_day, group_sizes, upgrade_group)
+    group_start_dates = start_date + (np.array(group_start_days, dtype=np.int64) - start_day).astype('timedelta64[D]')
+
+    return step_table(phases, *step_table_columns(start_date, group_start_dates[fleet.group_ids], group_wait_days[fleet.group_ids],
+                                                  upgrade_days, recover_days))
+
+def step_table(phases, phase_codes, step_codes, start_dates, finish_dates):
+    # phase & step are categoricals, so each phase name is held once however many steps (or hops) refer to it
+    phase_name_codes, phase_names = pd.factorize(np.asarray(phases, dtype=object))
+    return pd.DataFrame({
+        'phase': pd.Categorical.from_codes(phase_name_codes[phase_codes], categories=phase_names),
+        'step': pd.Categorical.from_codes(step_codes, categories=STEPS),
+        'start_date': start_dates,
+        'finish_date': finish_dates,
+    })
+
+def with_step_dtypes(steps):
+    # a step table from elsewhere (eg: a csv) with the dtypes the models emit; phases are listed in order of appearance
+    phase_codes, phases = pd.factorize(steps['phase'])
+    return step_table(np.asarray(phases), phase_codes, pd.Categorical(steps['step'], categories=STEPS).codes,
+                      steps['start_date'].values, steps['finish_date'].values)
+
+def step_table_columns(start_date, group_start_dates, wait_days, upgrade_days, recover_days):
+    # Columnar step table: 3 global steps followed by waiting, upgrading & recovering for each environment.
+    # Phase code 0 is the global phase, environment i (in group order) is phase code i+1.
+    # Several cycles (eg: the hops of an upgrade path) can be laid out at once by passing a start_date per cycle and
+    # (cycles x environments) arrays for the rest; the rows are then cycle by cycle, each with the same phase codes
+    start_dates_by_cycle = np.atleast_1d(np.asarray(start_date, dtype='datetime64[ns]'))
+    cycle_count = len(start_dates_by_cycle)
+    group_start_dates = np.asarray(group_start_dates, dtype='datetime64[ns]').reshape(cycle_count, -1)
+    env_count = group_start_dates.shape[1]
+    wait_days, upgrade_days, recover_days = (np.broadcast_to(days, group_start_dates.shape) for days in (wait_days, upgrade_days, recover_days))
+    step_boundaries = np.stack([
+        np.zeros(group_start_dates.shape, dtype=np.int64),
+        wait_days,
+        wait_days + upgrade_days,
+        wait_days + upgrade_days + recover_days,
+    ], axis=2).astype('timedelta64[D]')
+    phase_codes = np.empty((cycle_count, 3 + 3*env_count), dtype=np.int64)
+    step_codes = np.empty((cycle_count, 3 + 3*env_count), dtype=np.int64)
+    start_dates = np.empty((cycle_count, 3 + 3*env_count), dtype='datetime64[ns]')
+    finish_dates = np.empty((cycle_count, 3 + 3*env_count), dtype='datetime64[ns]')
+
+    global_boundaries = start_dates_by_cycle[:, np.newaxis] + np.array([0, IGNORE_DAYS, IGNORE_DAYS+PLAN_DAYS, IGNORE_DAYS+PLAN_DAYS+PREWORK_DAYS], dtype='timedelta64[D]')
+    phase_codes[:, :3] = 0
+    step_codes[:, :3] = [0, 1, 2]
+    start_dates[:, :3] = global_boundaries[:, :-1]
+    finish_dates[:, :3] = global_boundaries[:, 1:]
+
+    phase_codes[:, 3:] = np.repeat(np.arange(1, env_count+1), 3)
+    step_codes[:, 3:] = np.tile([3, 4, 5], env_count)
+    start_dates[:, 3:] = (group_start_dates[:, :, np.newaxis] + step_boundaries[:, :, :-1]).reshape(cycle_count, -1)
+    finish_dates[:, 3:] = (group_start_dates[:, :, np.newaxis] + step_boundaries[:, :, 1:]).reshape(cycle_count, -1)
+
+    return phase_codes.ravel(), step_codes.ravel(), start_dates.ravel(), finish_dates.ravel()
+
+
+@dataclass
+class CycleLengthDistribution:
+    cycle_days: np.ndarray # length in days of each simulated upgrade cycle
+
+    def percentile(self, q):
+        return np.percentile(self.cycle_days, q)
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p90(self):
+        return self.percentile(90)
+
+    @property
+    def p99(self):
+        return self.percentile(99)
+
+def _simulate_cycle_days(start_day, group_sizes, upgrade_days, trials, failure_count, maintenance_window, duration_model, seed_sequence):
+    rng = np.random.default_rng(seed_sequence)
+    env_count = sum(group_sizes)
+
+    # exactly failure_count failures per trial, like compute_next_upgrade_cycle: the environments with the smallest random keys fail
+    envs_with_upgrade_failures = np.zeros((trials, env_count), dtype=bool)
+    if failure_count > 0:
+        keys = rng.random((trials, env_count))
+        threshold = np.partition(keys, failure_count-1, axis=1)[:, failure_count-1:failure_count]
+        envs_with_upgrade_failures = keys <= threshold
+
+    group_busy_days = group_busy_days_for(group_sizes, upgrade_days + duration_model.recover_days(upgrade_days, envs_with_upgrade_failures))
+    _, end_days = chain_groups(
+        np.full(trials, start_day, dtype=np.int64), group_sizes,
+        lambda group, group_start_days: group_start_days + wait_days_for(group_start_days, maintenance_window) + group_busy_days[:, group]
+    )
+
+    return end_days - start_day
+
+def simulate_upgrade_cycles(start_date:date, environment_groups:Union[Fleet, List[EnvironmentGroup]], trials=10_000, upgrade_failure_percentage=1,
+                            maintenance_window='weekends', seed=None, processes:Optional[int]=None, duration_model=None):
+    # Monte Carlo version of compute_next_upgrade_cycle: the distribution of total cycle length over many random trials.
+    # Trials are split into fixed size chunks with their own spawned seeds, so results depend only on the seed - not on processes.
+    # seed can be anything np.random.default_rng accepts, including a Generator
+    fleet = as_fleet(environment_groups)
+    group_sizes = fleet.group_sizes
+    failure_count = round(len(fleet)*upgrade_failure_percentage)
+    duration_model = durations.duration_model_or_default(duration_model)
+    upgrade_days = duration_model.upgrade_days(fleet.nodes, fleet.pods)
+    start_day = int(to_datetime64(start_date).astype('datetime64[D]').astype(np.int64))
+
+    chunk_trials = [min(MONTE_CARLO_CHUNK_TRIALS, trials - chunk_start) for chunk_start in range(0, trials, MONTE_CARLO_CHUNK_TRIALS)]
+    seed_sequences = to_seed_sequence(seed).spawn(len(chunk_trials))
+    chunk_args = [(start_day, group_sizes, upgrade_days, n, failure_count, maintenance_window, duration_model, seed_sequence) for n, seed_sequence in zip(chunk_trials, seed_sequences)]
+
+    if processes and processes > 1 and len(chunk_args) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            chunks = list(executor.map(_simulate_cycle_days, *zip(*chunk_args)))
+    else:
+        chunks = [_simulate_cycle_days(*args) for args in chunk_args]
+
+    return CycleLengthDistribution(cycle_days=np.concatenate(chunks) if chunks else np.array([], dtype=np.int64))
@@ -1,37 +1,78 @@
+import numpy as np
 import pandas as pd
+from upgrade_model import environment_state as environment_state_builder
 from upgrade_model import k8s_releases_loader
 
-k8s_releases = k8s_releases_loader.load()
+k8s_release_catalog = k8s_releases_loader.load_catalog()
 
-def compute(id, start_date, end_date, first_version, upgrade_every):
+def upgrade_event_offsets(days, first_version_idxs, upgrade_everys, catalog=None, last_upgrade_offsets=None):
+    # Works out the day offset of each upgrade for many environments at once; column k holds the day each
+    # environment moves onto its k+1th successor version (or len(days) if that never happens within the horizon).
+    # The cost is proportional to environments x upgrades rather than environments x days.
+    # last_upgrade_offsets (default 0) resumes environments that last upgraded before days[0], at a negative offset
+    catalog = k8s_release_catalog if catalog is None else catalog
+    first_version_idxs = np.asarray(first_version_idxs, dtype=np.int64)
+    upgrade_everys = np.asarray(upgrade_everys, dtype=np.int64)
+    release_offsets = catalog.release_days - k8s_releases_loader.to_days(days[:1])[0]
+    successors = catalog.successors
+
+    max_upgrades = max(0, len(catalog)-1-catalog.version_ranks[first_version_idxs].min()) if len(first_version_idxs) else 0
+    event_offsets = np.full((len(first_version_idxs), max_upgrades), len(days), dtype=np.int64)
+
+    current_k8s_version_idxs = first_version_idxs.copy()
+    last_upgrade_offsets = np.zeros(len(first_version_idxs), dtype=np.int64) if last_upgrade_offsets is None else np.array(last_upgrade_offsets, dtype=np.int64)
+    earliest_offsets = np.zeros(len(first_version_idxs), dtype=np.int64) # at most one upgrade per day
+    upgrading = successors[current_k8s_version_idxs] >= 0
+    upgrade_count = 0
+    for k in range(max_upgrades):
+        next_k8s_version_idxs = np.where(upgrading, successors[current_k8s_version_idxs], current_k8s_version_idxs)
+        upgrade_offsets = np.maximum.reduce([
+            last_upgrade_offsets + upgrade_everys,
+            release_offsets[next_k8s_version_idxs], #only upgrade if next version has been released
+            earliest_offsets,
+        ])
+        upgrading &= upgrade_offsets < len(days)
+        if not upgrading.any():
+            break
+        event_offsets[upgrading, k] = upgrade_offsets[upgrading]
+        upgrade_count = k+1
+        current_k8s_version_idxs[upgrading] = next_k8s_version_idxs[upgrading]
+        last_upgrade_offsets[upgrading] = upgrade_offsets[upgrading]
+        earliest_offsets[upgrading] = upgrade_offsets[upgrading]+1
+        upgrading &= successors[current_k8s_version_idxs] >= 0
+
+    return event_offsets[:, :upgrade_count]
+
+def upgrade_events(days, first_version_idx, upgrade_every, catalog=None):
+    catalog = k8s_release_catalog if catalog is None else catalog
+    event_offsets = upgrade_event_offsets(days, [first_version_idx], [upgrade_every], catalog)[0]
+    event_offsets = np.concatenate([[0], event_offsets[event_offsets < len(days)]])
+    first_version_rank = catalog.version_ranks[first_version_idx]
+
+    return event_offsets, catalog.version_order[first_version_rank + np.arange(len(event_offsets))]
+
+def version_indexes(days, first_version_idxs, upgrade_everys, catalog=None, last_upgrade_offsets=None):
+    # (environments x days) array of positions in the catalog
+    catalog = k8s_release_catalog if catalog is None else catalog
+    event_offsets = upgrade_event_offsets(days, first_version_idxs, upgrade_everys, catalog, last_upgrade_offsets)
+    return version_indexes_from_events(event_offsets, first_version_idxs, 0, len(days), catalog)
+
+def version_indexes_from_events(event_offsets, first_version_idxs, start_offset, stop_offset, catalog=None):
+    # (environments x days) positions in the catalog for just the days in [start_offset, stop_offset), so a long horizon
+    # can be materialised a window at a time. Upgrades before the window all count towards its first day
+    catalog = k8s_release_catalog if catalog is None else catalog
+    upgrades = np.zeros((len(event_offsets), stop_offset-start_offset+1), dtype=np.int64)
+    rows = np.arange(len(event_offsets))
+    for k in range(event_offsets.shape[1]):
+        upgrades[rows, np.clip(event_offsets[:, k] - start_offset, 0, stop_offset-start_offset)] += 1
+
+    first_version_ranks = catalog.version_ranks[np.asarray(first_version_idxs, dtype=np.int64)]
+    return catalog.version_order[first_version_ranks[:, np.newaxis] + upgrades[:, :-1].cumsum(axis=1)]
+
+def compute(id, start_date, end_date, first_version, upgrade_every, catalog=None):
+    catalog = k8s_release_catalog if catalog is None else catalog
     days = pd.date_range(start=start_date, end=end_date, freq='D')
-    
-    environment_ids = [id]
-    environment_state = pd.DataFrame(
-        index=pd.MultiIndex.from_product([environment_ids,days],names=['environment_id','at_date'])
-        ,data=[]
-    ).reset_index() 
-
-    days_since_last_upgrade=0
-    current_k8s_version_idx = k8s_releases.index[k8s_releases['version']==first_version].values[0]
-    for row in environment_state.itertuples():
-        if days_since_last_upgrade >= upgrade_every:
-            next_k8s_version_idx = min(len(k8s_releases)-1, current_k8s_version_idx+1)
-            if k8s_releases.at[next_k8s_version_idx,'release_date'] <= row.at_date: #only upgrade if next version has been released
-                current_k8s_version_idx = next_k8s_version_idx
-                days_since_last_upgrade=0
-        
-        environment_state.loc[row.Index,['version', 'release_date', 'end_of_support_date']] = [
-            k8s_releases.at[current_k8s_version_idx,'version'], 
-            k8s_releases.at[current_k8s_version_idx,'release_date'], 
-            k8s_releases.at[current_k8s_version_idx,'end_of_support_date'], 
-        ]
-
-        days_since_last_upgrade+=1
-
-    environment_state['release_date'] = pd.to_datetime(environment_state['release_date'])
-    environment_state['end_of_support_date'] = pd.to_datetime(environment_state['end_of_support_date'])
-    environment_state['release_age'] = (environment_state['at_date'] - environment_state['release_date']).dt.days
-    environment_state['days_until_end_of_support'] = (environment_state['end_of_support_date'] - environment_state['at_date']).dt.days
-
-    return environment_state
\ No newline at end of file
+
+    k8s_version_idxs = version_indexes(days, [catalog.position(first_version)], [upgrade_every], catalog)
+
+    return environment_state_builder.from_version_indexes([id], days, k8s_version_idxs, catalog)
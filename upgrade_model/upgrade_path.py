@@ -0,0 +1,114 @@
+# Multi-hop upgrade paths: upgrading a fleet from start_version to target_version one minor release (hop) at a time.
+#
+# Each hop is an upgrade cycle like compute_next_upgrade_cycle's, starting when the previous hop has finished. The whole
+# path is planned in one pass with hops as an array dimension - only the (hops x groups) chain of group start days is
+# walked in Python - and the step table is only built when it is asked for, so questions like "when does every environment
+# reach the target?" don't pay for it
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from upgrade_model import durations
+from upgrade_model import k8s_releases_loader
+from upgrade_model import maintenance_windows
+from upgrade_model import scheduler
+from upgrade_model import upgrade_cycle
+from upgrade_model.upgrade_cycle import EnvironmentGroup, Fleet
+
+@dataclass
+class UpgradePath:
+    versions:             np.ndarray # start version, each intermediate version & target version
+    start_date:           np.datetime64
+    environment_names:    np.ndarray
+    phases:               List[str]  # of a single hop, see Fleet.phases
+    end_of_support_dates: np.ndarray # (hops) datetime64[ns] each hop's from version goes out of support
+    hop_start_dates:      np.ndarray # (hops) datetime64[ns]
+    group_start_dates:    np.ndarray # (hops x environments) datetime64[ns] each environment's group started upgrading
+    wait_days:            np.ndarray # (hops x environments)
+    upgrade_days:         np.ndarray # (environments)
+    recover_days:         np.ndarray # (hops x environments)
+
+    @property
+    def hops(self):
+        return [f"{from_version} -> {to_version}" for from_version, to_version in zip(self.versions[:-1], self.versions[1:])]
+
+    @property
+    def upgraded_dates(self):
+        # (hops x environments) date each environment finished each hop, including recovering from a failed upgrade
+        return self.group_start_dates + (self.wait_days + self.upgrade_days + self.recover_days).astype('timedelta64[D]')
+
+    def target_reached_dates(self):
+        return pd.Series(self.upgraded_dates[-1], index=pd.Index(self.environment_names, name='environment'), name='target_reached_date')
+
+    def off_support_days(self):
+        # (environments x hops) days each environment spent on each hop's from version after it went out of support
+        upgraded_dates = self.upgraded_dates
+        on_version_since = np.concatenate([np.full((1, upgraded_dates.shape[1]), self.start_date, dtype='datetime64[ns]'), upgraded_dates[:-1]])
+        off_support_since = np.maximum(on_version_since, self.end_of_support_dates[:, np.newaxis])
+        days = np.maximum(upgraded_dates - off_support_since, np.timedelta64(0, 'D')).astype('timedelta64[D]').astype(np.int64)
+        return pd.DataFrame(days.T, index=pd.Index(self.environment_names, name='environment'), columns=pd.Index(self.hops, name='hop'))
+
+    def step_table(self):
+        # phase & step are categoricals; phases are prefixed with their hop, eg: "1.18.0 -> 1.19.0: Global"
+        phase_codes, step_codes, start_dates, finish_dates = upgrade_cycle.step_table_columns(
+            self.hop_start_dates, self.group_start_dates, self.wait_days, self.upgrade_days, self.recover_days
+        )
+        hop_codes = np.repeat(np.arange(len(self.hop_start_dates)), len(phase_codes) // max(len(self.hop_start_dates), 1))
+        hop_phases = [f"{hop}: {phase}" for hop in self.hops for phase in self.phases]
+        return upgrade_cycle.step_table(hop_phases, hop_codes*len(self.phases) + phase_codes, step_codes, start_dates, finish_dates)
+
+def plan(start_date:date, start_version, target_version, environment_groups:Union[Fleet, List[EnvironmentGroup]], upgrade_failure_percentage=1,
+         maintenance_window='weekends', rng=None, duration_model=None, catalog=None):
+    # Gives the same steps as calling compute_next_upgrade_cycle for each hop in turn with the same rng
+    catalog = k8s_releases_loader.load_catalog() if catalog is None else catalog
+    versions = catalog.versions_between(start_version, target_version)
+    if len(versions) < 2:
+        raise ValueError(f"Expected at least one release from {start_version} to {target_version}")
+    hop_count = len(versions) - 1
+    rng = np.random.default_rng(rng)
+    fleet = upgrade_cycle.as_fleet(environment_groups)
+    group_sizes = fleet.group_sizes.tolist()
+    duration_model = durations.duration_model_or_default(duration_model)
+
+    upgrade_days = duration_model.upgrade_days(fleet.nodes, fleet.pods)
+    envs_with_upgrade_failures = np.stack([
+        upgrade_cycle.sample_upgrade_failures(rng, len(fleet), upgrade_failure_percentage) for _ in range(hop_count)
+    ]).reshape(hop_count, len(fleet))
+    recover_days = duration_model.recover_days(upgrade_days, envs_with_upgrade_failures)
+
+    group_busy_days = upgrade_cycle.group_busy_days_for(group_sizes, upgrade_days + recover_days).tolist()
+
+    # the only sequential part: each group (& hop) starts when the one before it has finished, then waits for a maintenance window
+    start_date = upgrade_cycle.to_datetime64(start_date)
+    first_day = start_date.astype('datetime64[D]')
+    calendar = maintenance_windows.calendar_for(maintenance_window)
+    next_open_offsets = []
+    hop_start_offsets = np.empty(hop_count, dtype=np.int64)
+    group_start_offsets = np.empty((hop_count, len(group_sizes)), dtype=np.int64)
+    group_wait_days = np.zeros((hop_count, len(group_sizes)), dtype=np.int64)
+    def upgrade_group(group, group_start):
+        while group_start >= len(next_open_offsets):
+            scheduler.extend_next_open_offsets(next_open_offsets, first_day, calendar)
+        group_wait_days[hop, group] = next_open_offsets[group_start] - group_start
+        return next_open_offsets[group_start] + group_busy_days[hop][group]
+
+    hop_start = 0
+    for hop in range(hop_count):
+        hop_start_offsets[hop] = hop_start
+        group_start_offsets[hop], hop_start = upgrade_cycle.chain_groups(hop_start, group_sizes, upgrade_group)
+
+    return UpgradePath(
+        versions=versions,
+        start_date=start_date,
+        environment_names=fleet.names,
+        phases=fleet.phases(),
+        end_of_support_dates=catalog.end_of_support_dates[catalog.positions_of(versions[:-1])],
+        hop_start_dates=start_date + hop_start_offsets.astype('timedelta64[D]'),
+        group_start_dates=start_date + group_start_offsets[:, fleet.group_ids].astype('timedelta64[D]'),
+        wait_days=group_wait_days[:, fleet.group_ids],
+        upgrade_days=upgrade_days,
+        recover_days=recover_days,
+    )
@@ -0,0 +1,37 @@
+# Kubernetes style semantic versions (major.minor.patch, optionally prefixed with a v).
+#
+# Versions are parsed once into integers; each is also packed into a single int64 version number that sorts the same way
+# the version does, so ordering is an argsort and range queries are a binary search over a sorted array of version numbers
+import numpy as np
+
+PART_BITS = 20 # up to 1,048,575 minor & patch releases
+
+def parse_version(version):
+    major, minor, patch = (int(part) for part in str(version).lstrip('v').split('.'))
+    return major, minor, patch
+
+def parse_versions(versions):
+    # (versions x 3) int64 major, minor, patch
+    return np.array([parse_version(v) for v in versions], dtype=np.int64).reshape(-1, 3)
+
+def version_numbers(version_keys):
+    version_keys = np.asarray(version_keys, dtype=np.int64)
+    return (version_keys[..., 0] << 2*PART_BITS) | (version_keys[..., 1] << PART_BITS) | version_keys[..., 2]
+
+def version_number(version):
+    return int(version_numbers(parse_version(version)))
+
+def sorted_order(versions):
+    # positions of versions sorted by semantic version (rather than as strings, where 1.10.0 < 1.9.0)
+    return np.argsort(version_numbers(parse_versions(versions)), kind='stable')
+
+def greater_than(sorted_version_numbers, version):
+    # slice of sorted_version_numbers that are newer than version (which needn't be one of them)
+    return slice(np.searchsorted(sorted_version_numbers, version_number(version), side='right'), len(sorted_version_numbers))
+
+def between(sorted_version_numbers, start_version, end_version):
+    # slice of sorted_version_numbers from start_version to end_version inclusive
+    return slice(
+        np.searchsorted(sorted_version_numbers, version_number(start_version), side='left'),
+        np.searchsorted(sorted_version_numbers, version_number(end_version), side='right'),
+    )